@@ -107,7 +107,7 @@ class ExampleApp(QtGui.QMainWindow, design.Ui_MainWindow):
 		
 		if self.tableCompartments.item(FinalRowIndex-1,1) != QtGui.QTableWidgetItem(''):
 			print('Change to Name')
-			print self.tableCompartments.item(FinalRowIndex-1,1)
+			print(self.tableCompartments.item(FinalRowIndex-1,1))
 			self.tableCompartments.insertRow(FinalRowIndex)
 		elif self.tableCompartments.item(FinalRowIndex-1,2) != QtGui.QTableWidgetItem(''):
 			print('Change to Value')
@@ -528,7 +528,7 @@ class ExampleApp(QtGui.QMainWindow, design.Ui_MainWindow):
 			nameIndexDictionary[str(self.treeWidget.currentItem().text(0))]
 			)
 		except:
-			print 'ERROR: Unable to register treeWidget selection.'
+			print('ERROR: Unable to register treeWidget selection.')
 		
 		return None
 	
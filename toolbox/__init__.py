@@ -1,3 +1,3 @@
-import sampling, sbml, simulation, visuals
+from . import sampling, sbml, simulation, visuals
 
-from createSciPyModel import createSciPyModel
\ No newline at end of file
+from .createSciPyModel import createSciPyModel
\ No newline at end of file
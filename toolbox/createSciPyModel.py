@@ -53,6 +53,8 @@ def createSciPyModel():
             self.VolumeUnits = None
             self.SubstanceUnits = None
             self.TimeUnits = None
+            self.CacheDirectory = None
+            self.CacheSizeLimit = None
 
         def UpdateModel(self):
             self.Species.Quantity = len(self.Species.Names)
@@ -80,6 +82,7 @@ def createSciPyModel():
             self.Value = []
             self.MetaID = []
             self.KineticFlag = []
+            self.FixedFlag = []
             self.MinimumValue = []
             self.MaximumValue = []
             self.NullSpaceDimension = None
@@ -100,6 +103,11 @@ def createSciPyModel():
             self.Names = []
             self.Formulas = []
             self.Stoichiometry = []
+            self.StoichiometryFormat = 'dense'
+            self.Dependency = None
+            self.JacobianSparsity = None
+            self.KineticIndex = []
+            self.Monomials = []
 
     # Class to organize SciPyModel simulation data
     class SimulationData:
@@ -107,6 +115,14 @@ def createSciPyModel():
             self.TimeStart = None
             self.TimeEnd = None
             self.DataPoints = None
+            self.Method = None
+            self.RelativeTolerance = None
+            self.AbsoluteTolerance = None
+            self.MaximumStep = None
+            self.FirstStep = None
+            self.DenseOutput = False
+            self.StorageDirectory = None
+            self.StorageDtype = None
             self.Deterministic = Deterministic()
             self.Sensitivity = Sensitivity()
 
@@ -114,28 +130,57 @@ def createSciPyModel():
         def __init__(self):
             self.Data = None
             self.TimeVector = None
+            self.Interpolant = None
+            self.Method = None
 
     class Sensitivity:
         def __init__(self):
             self.Global = Global()
             self.Local = Local()
+            self.Adjoint = Adjoint()
 
     class Global:
         def __init__(self):
             self.NumSamples = None
             self.Data = None
+            self.TimeVector = None
             self.ParameterSets = None
+            self.InitialValues = None
+            self.MovedParameter = None
+            self.UnitStep = None
+            self.NumDraws = None
+            self.AcceptanceRate = None
+            self.FirstOrder = None
+            self.TotalOrder = None
+            self.FirstOrderInterval = None
+            self.TotalOrderInterval = None
+            self.Mu = None
+            self.MuStar = None
+            self.Sigma = None
 
     class Local:
         def __init__(self):
             self.Data = None
             self.PercentVary = None
+            self.Method = None
+
+    class Adjoint:
+        def __init__(self):
+            self.Data = None
+            self.Objective = None
+            self.Cost = None
+            self.Gradient = None
 
     # Class to organize SciPyModel toolbox-specific function information
     class ToolboxFunctions:
         def __init__(self):
             self.DerivativeFunction = None
+            self.DerivativeModule = None
+            self.DerivativeKey = None
             self.NullSpace = None
+            self.NullSpaceFunction = None
+            self.NullSpaceSource = None
+            self.NullSpaceModule = None
 
     # Call Model class to return empty SciPyModel
     return Model()
@@ -1,3 +1,8 @@
-from createNullSpaceFunction import createNullSpaceFunction
-from uniformLatinHypercubeSample import uniformLatinHypercubeSample
-from uniformNullSpaceSample import uniformNullSpaceSample
\ No newline at end of file
+from .createNullSpaceFunction import createNullSpaceFunction
+from .createRandomGenerator import createRandomGenerator, spawnRandomGenerators
+from .findKineticParameters import findKineticParameters
+from .hitAndRunNullSpaceSample import hitAndRunNullSpaceSample
+from .morrisTrajectorySample import morrisTrajectorySample
+from .quasiRandomSample import quasiRandomSample, iterQuasiRandomSample
+from .uniformLatinHypercubeSample import uniformLatinHypercubeSample
+from .uniformNullSpaceSample import uniformNullSpaceSample
\ No newline at end of file
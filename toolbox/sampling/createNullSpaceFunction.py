@@ -1,12 +1,13 @@
-def createNullSpaceFunction( SciPyModel ):
+def createNullSpaceFunction( SciPyModel, Method='auto', Tolerance=None ):
     ''' 
         Generate the NullSpace of the kinetic parameters
         (parameters which enter the derivative matrix
         linearly). The nullspace in this case can be used
         to solve the system for the steady-state condition.
         
-        This operation happens using the SymPy module to
-        solve the homogenous equation A*x = 0.
+        This operation happens either using the SymPy module to
+        solve the homogenous equation A*x = 0 exactly, or
+        numerically with a rank-revealing SVD.
 
         To Do
         -----
@@ -18,78 +19,388 @@ def createNullSpaceFunction( SciPyModel ):
         Parameters
         ----------
         SciPyModel : internal object instance
+        Method : str, optional
+            'symbolic' for the exact rational basis from SymPy,
+            'numeric' for the SVD backend or 'auto' (default),
+            which uses SymPy for models of up to 10 reactions.
+        Tolerance : float, optional
+            Relative singular value threshold of the numeric
+            rank decisions. Defaults to the machine precision
+            times the larger dimension of A.
         
         Returns
         -------
         SciPyModel : internal object instance
             SciPyModel with NullSpaceFunction based on
-            model parameterization.
+            model parameterization. The generated source is
+            placed into ToolboxFunctions.NullSpaceSource and its
+            compiled module into ToolboxFunctions.NullSpaceModule.
             
         See Also
         --------
+        findKineticParameters, writeNullSpaceFunction,
+        uniformNullSpaceSample
         
         Notes
         -----
-        The anonymous function can be called as follows:
+        The function can be called as follows:
         
         NullSpaceFunction( E, X )
         
-        This produces a SymPy matrix of the nullspace 
-        given the desired steady state condition as specified
-        by the user choice in E and X.
+        This produces a (kinetic parameters x nullspace
+        dimension) array of the nullspace given the desired
+        steady state condition as specified by the user choice
+        of the non-kinetic parameters E and the species X.
+
+        The module also holds the batched variant
+
+        nullspace_fun_batch( E, X )
+
+        which takes one sample per row of E (N x non-kinetic
+        parameters) and X (N x species) and returns the
+        (N x kinetic parameters x nullspace dimension) array.
+
+        The kinetic parameters and the monomials they multiply
+        are found by findKineticParameters, and A = S diag(m) G is
+        assembled from the nonzero stoichiometric coefficients
+        of the kinetic reactions, G summing the columns of the
+        reactions led by the same kinetic parameter into one,
+        i.e. A[:, k] = sum_j S[:, j] m_j. Both backends return the same
+        basis, i.e. the reduced row echelon basis of A which is
+        the identity on the non-pivot reactions. The numeric backend selects the
+        pivots once, by SVD rank tests at Parameters.Value and
+        Species.Value, and evaluates the remaining rows for
+        every sample with a batched pseudoinverse, see
+        writeNumericNullSpaceFunction. The nullspace dimension
+        is therefore fixed by the nominal state.
+
+        If MetaData.CacheDirectory is set the generated source
+        is stored there, keyed by the formulas, stoichiometry,
+        kinetic parameters and Method, see sourceCache, so the
+        symbolic elimination runs once per model structure.
         
     '''
 
-    import sympy, datetime, numpy
+    import __future__, sympy, numpy, scipy.sparse
+    import toolbox
+    from toolbox.simulation.sourceCache import (hashModelSource,
+                                                readSourceCache,
+                                                writeSourceCache)
     
     # Automatically flag kinetic parameters.
-    for rxn in SciPyModel.Reactions.Formulas:
-        if SciPyModel.Reactions.Formulas[0][0] == 'p':
-            SciPyModel.Parameters.KineticFlag[int(
-                rxn.split(']')[0].split('[')[1])] = True
-    
-    # Write derivative function to file
-    TempName = (SciPyModel.MetaData.Name
-                +datetime.datetime.now().strftime("%I%M%p%B%d%Y")
-                +'.py')
-    open(TempName, 'w+').write(SciPyModel.ToolboxFunctions.DerivativeFunction)
-    
-    # Import derivative function from temporary file.
-    TempModule = __import__(TempName[:-3])
+    SciPyModel = toolbox.sampling.findKineticParameters(SciPyModel)
 
-    # Create symbolic species and parameter vectors
-    y = sympy.symarray('y', len(SciPyModel.Species.Names))
-    p = sympy.symarray('p', len(SciPyModel.Parameters.Names))
+    # Coefficients of the kinetic reactions, ordered like their kinetic
+    # parameters, and the column of A, i.e. the kinetic parameter, each
+    # of them adds to
+    KineticReactions = [
+        rxn_ix for p_ix, rxn_ix in sorted(
+            (p_ix, rxn_ix) for rxn_ix, p_ix in enumerate(
+                SciPyModel.Reactions.KineticIndex) if p_ix >= 0)
+    ]
+    KineticColumn = dict(
+        (p_ix, k_ix) for k_ix, p_ix in enumerate(
+            numpy.flatnonzero(SciPyModel.Parameters.KineticFlag)))
+    Group = [KineticColumn[SciPyModel.Reactions.KineticIndex[rxn_ix]]
+             for rxn_ix in KineticReactions]
+    Stoichiometry = scipy.sparse.csc_matrix(
+        SciPyModel.Reactions.Stoichiometry)
 
-    # Create symbolic reaction and stoichiometry matrices
-    R = sympy.Matrix(TempModule.rxn_fun(y,0,p))
-    S = sympy.Matrix(SciPyModel.Reactions.Stoichiometry)
-    
-    # Create symbolic derivative matrix
-    DerivativeMatrix = sympy.Matrix(
-    [S[:, i] * R[i] for i in range(len(R))]).reshape(S.shape[1],
-                                                     S.shape[0]).transpose()
-    
-    # Extract kinetic parameters
-    M = sympy.Matrix(
-    sympy.lambdify((p[SciPyModel.Parameters.KineticFlag]), DerivativeMatrix,
-                   'sympy')(*sympy.ones(
-                       len(p[SciPyModel.Parameters.KineticFlag]), 1)))
-    
-    # Obtain basis for nullspace
-    NullBasis = M.nullspace()
-    SciPyModel.Parameters.NullSpaceDimension = len( NullBasis )
-    
-    # Assemble nullspace matrix from basis
-    NullSpace = sympy.Matrix([NullBasis[i] for i in range(len(NullBasis))])
-    NullSpace = NullSpace.reshape(len(NullBasis),
-                                  len(NullSpace) / len(NullBasis)).transpose()
-    
-    # Create anonymous sampling function
-    SciPyModel.ToolboxFunctions.NullSpaceFunction = sympy.lambdify(
-        (p[numpy.invert(SciPyModel.Parameters.KineticFlag)],y),
-        NullSpace,
-        'numpy',
-        dummify=False)
-    
-    return SciPyModel
\ No newline at end of file
+    # Reactions which change no species do not enter the steady state
+    Changing = numpy.asarray(abs(Stoichiometry).sum(axis=0)).ravel() > 0
+    NumLeftOut = sum(1 for rxn_ix, p_ix in enumerate(
+        SciPyModel.Reactions.KineticIndex) if p_ix < 0 and Changing[rxn_ix])
+    if NumLeftOut > 0:
+        print('WARNING: ' + str(NumLeftOut) +
+              ' reactions have no kinetic parameter and are left out of '
+              'the steady state condition.')
+    Stoichiometry = Stoichiometry[:, KineticReactions]
+    Monomials = [SciPyModel.Reactions.Monomials[rxn_ix]
+                 for rxn_ix in KineticReactions]
+
+    # Exact elimination in SymPy becomes slow for larger models
+    if Method == 'auto':
+        if SciPyModel.Reactions.Quantity <= 10:
+            Method = 'symbolic'
+        else:
+            Method = 'numeric'
+
+    # Reuse the source generated for a model of the same structure
+    if SciPyModel.MetaData.CacheDirectory != None:
+        Settings = (Method, Tolerance)
+        if Method == 'numeric':
+            # The pivots are chosen at the nominal state
+            Settings += (
+                numpy.asarray(SciPyModel.Parameters.Value, dtype=float).tolist(),
+                numpy.asarray(SciPyModel.Species.Value, dtype=float).tolist())
+        Key = hashModelSource(SciPyModel, 'NullSpace', Settings)
+        Source, MetaData = readSourceCache(SciPyModel, Key)
+        if Source != None:
+            SciPyModel.Parameters.NullSpaceDimension = (
+                MetaData['NullSpaceDimension'])
+            return loadNullSpaceFunction(SciPyModel, Source)
+
+    if Method == 'numeric':
+        Source = writeNumericNullSpaceFunction(SciPyModel, Stoichiometry,
+                                               Monomials, Group, Tolerance)
+    else:
+        # Create symbolic species and parameter vectors
+        y = sympy.symarray('y', len(SciPyModel.Species.Names))
+        p = sympy.symarray('p', len(SciPyModel.Parameters.Names))
+
+        # Evaluate the monomials symbolically, with true division as in
+        # the generated derivative function
+        Namespace = {'y': y, 'p': p, 'numpy': numpy, 'sympy': sympy}
+        Values = [
+            eval(compile(Monomial, '<monomial>', 'eval',
+                         __future__.division.compiler_flag, True), Namespace)
+            for Monomial in Monomials
+        ]
+
+        # Scale only the nonzero stoichiometric entries by their monomials
+        # and sum the reactions of every kinetic parameter
+        S = Stoichiometry.tocoo()
+        Entries = {}
+        for i, j, v in zip(S.row.tolist(), S.col.tolist(), S.data.tolist()):
+            Entries[(i, Group[j])] = (Entries.get((i, Group[j]), 0) +
+                                      sympy.sympify(v) * Values[j])
+        M = sympy.Matrix(sympy.SparseMatrix(S.shape[0], len(KineticColumn),
+                                            Entries))
+
+        # Obtain basis for nullspace
+        NullBasis = M.nullspace()
+        SciPyModel.Parameters.NullSpaceDimension = len( NullBasis )
+
+        # Assemble nullspace matrix from basis
+        if len(NullBasis) > 0:
+            NullSpace = sympy.Matrix.hstack(*NullBasis)
+        else:
+            NullSpace = sympy.zeros(len(KineticColumn), 0)
+
+        # Generate the sampling functions
+        Source = writeNullSpaceFunction(NullSpace, numpy.flatnonzero(
+            numpy.invert(SciPyModel.Parameters.KineticFlag)))
+
+    if SciPyModel.MetaData.CacheDirectory != None:
+        writeSourceCache(SciPyModel, Key, Source, {
+            'NullSpaceDimension': SciPyModel.Parameters.NullSpaceDimension})
+
+    return loadNullSpaceFunction(SciPyModel, Source)
+
+
+def loadNullSpaceFunction( SciPyModel, Source ):
+    '''
+        Compile the nullspace Source and place it, its module and
+        nullspace_fun into SciPyModel.ToolboxFunctions.
+    '''
+    from toolbox.simulation.compileODEFunction import compileSource
+
+    SciPyModel.ToolboxFunctions.NullSpaceSource = Source
+    SciPyModel.ToolboxFunctions.NullSpaceModule = compileSource(
+        Source, 'SciPyModel_NullSpace')
+    SciPyModel.ToolboxFunctions.NullSpaceFunction = (
+        SciPyModel.ToolboxFunctions.NullSpaceModule.nullspace_fun)
+
+    return SciPyModel
+
+
+def writeNullSpaceFunction( NullSpace, NonKineticIndex ):
+    '''
+        Write the source of nullspace_fun( e, y ) and
+        nullspace_fun_batch( E, X ) evaluating the symbolic
+        (kinetic parameters x dimension) NullSpace matrix, which
+        is given in the symbols p_i of the non-kinetic
+        parameters NonKineticIndex and the species y_i. Only
+        the nonzero entries are written.
+    '''
+    import re, sympy
+    from sympy.printing.lambdarepr import NumPyPrinter
+
+    NullSpace = sympy.Matrix(NullSpace)
+    Position = dict((int(p_ix), e_ix)
+                    for e_ix, p_ix in enumerate(NonKineticIndex))
+    Printer = NumPyPrinter()
+
+    # Print entries with e[i] and y[i], or E[:, i] and X[:, i], for the
+    # non-kinetic parameters and species
+    def PrintCode(Expression, Parameter, Species):
+        Code = Printer.doprint(Expression)
+        Code = re.sub(r'\bp_(\d+)\b', lambda Match: Parameter % Position[
+            int(Match.group(1))], Code)
+        return re.sub(r'\by_(\d+)\b', lambda Match: Species % int(
+            Match.group(1)), Code)
+
+    Entries = [(i, j, NullSpace[i, j]) for i in range(NullSpace.rows)
+               for j in range(NullSpace.cols) if NullSpace[i, j] != 0]
+    Shape = str(NullSpace.rows) + ', ' + str(NullSpace.cols)
+
+    generated_code = ''
+    generated_code += 'from __future__ import division \n'
+    generated_code += 'import numpy \n'
+    generated_code += '\n'
+    generated_code += 'def nullspace_fun( e, y ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    N = numpy.zeros([' + Shape + '], dtype=numpy.result_type('
+        'numpy.asarray(e), numpy.asarray(y), 1.)) \n')
+    for i, j, Expression in Entries:
+        generated_code += ('    N[' + str(i) + ', ' + str(j) + '] = ' +
+                           PrintCode(Expression, 'e[%d]', 'y[%d]') + '\n')
+    generated_code += '    return N \n'
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def nullspace_fun_batch( E, X ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    N = numpy.zeros([E.shape[0], ' + Shape + '], dtype='
+        'numpy.result_type(E, X, 1.)) \n')
+    for i, j, Expression in Entries:
+        generated_code += (
+            '    N[:, ' + str(i) + ', ' + str(j) + '] = ' +
+            PrintCode(Expression, 'E[:, %d]', 'X[:, %d]') + '\n')
+    generated_code += '    return N \n'
+
+    return bytearray(generated_code.encode())
+
+
+def writeNumericNullSpaceFunction( SciPyModel, Stoichiometry, Monomials,
+                                   Group, Tolerance=None ):
+    '''
+        Write the source of nullspace_fun( e, y ) and
+        nullspace_fun_batch( E, X ) for the numeric backend,
+        given the scipy.sparse (species x kinetic reactions)
+        Stoichiometry, the vectorized Monomials of the kinetic
+        reactions from findKineticParameters and the column of
+        A every kinetic reaction belongs to in Group.
+
+        The source also defines monomial_fun_batch( E, X ) and
+        coefficient_fun( e, y ), which returns the coefficient
+        matrix A = S diag(m) G as a scipy.sparse matrix built
+        from the nonzeros of S. The nullspace functions return the
+        basis
+
+            N[free] = I,    N[pivot] = -pinv(A[:, pivot]) A[:, free]
+
+        The pivot reactions are chosen from left to right as in
+        a reduced row echelon form, adding a reaction whenever
+        the rank of the unit-normalized columns of A at the
+        nominal state increases. Sets
+        Parameters.NullSpaceDimension.
+    '''
+    import re, numpy
+    from toolbox.simulation.compileODEFunction import compileSource
+
+    KineticFlag = numpy.array(SciPyModel.Parameters.KineticFlag, dtype=bool)
+    NonKineticIndex = numpy.flatnonzero(numpy.invert(KineticFlag))
+    Position = dict((p_ix, e_ix) for e_ix, p_ix in enumerate(NonKineticIndex))
+    NumReactions = Stoichiometry.shape[1]
+    NumKinetic = int(numpy.sum(KineticFlag))
+
+    def VectorizeFormula(Formula):
+        Formula = re.sub(r'\by\[(\d+)\]', r'X[:, \1]', Formula)
+        return re.sub(r'\bp\[(\d+)\]', lambda Match: 'E[:, ' + str(
+            Position[int(Match.group(1))]) + ']', Formula)
+
+    # Write the kinetic stoichiometry and the monomials
+    generated_code = ''
+    generated_code += 'from __future__ import division \n'
+    generated_code += 'import numpy, scipy.sparse \n'
+    generated_code += '\n'
+    generated_code += (
+        'S_kinetic = scipy.sparse.csc_matrix((' +
+        'numpy.array(' + repr(Stoichiometry.data.tolist()) + '), ' +
+        'numpy.array(' + repr(Stoichiometry.indices.tolist()) + ', dtype=int), ' +
+        'numpy.array(' + repr(Stoichiometry.indptr.tolist()) + ', dtype=int)), ' +
+        'shape=' + repr(Stoichiometry.shape) + ') \n')
+    generated_code += 'S_kinetic_dense = S_kinetic.toarray() \n'
+    generated_code += (
+        'kinetic_cols = numpy.repeat(numpy.arange(' + str(NumReactions) +
+        '), numpy.diff(S_kinetic.indptr)) \n')
+    generated_code += (
+        'G = scipy.sparse.csc_matrix((numpy.ones(' + str(NumReactions) +
+        '), (numpy.arange(' + str(NumReactions) + '), numpy.array(' +
+        repr(list(Group)) + ', dtype=int))), shape=(' + str(NumReactions) +
+        ', ' + str(NumKinetic) + ')) \n')
+    generated_code += 'G_dense = G.toarray() \n'
+    generated_code += '\n'
+    generated_code += 'def monomial_fun_batch( E, X ): \n'
+    generated_code += '\n'
+    generated_code += '    E = numpy.atleast_2d(numpy.asarray(E)) \n'
+    generated_code += '    X = numpy.atleast_2d(numpy.asarray(X)) \n'
+    generated_code += (
+        '    m = numpy.zeros([E.shape[0], ' + str(NumReactions) +
+        '], dtype=numpy.result_type(E, X, 1.)) \n')
+    for rxn_ix, Monomial in enumerate(Monomials):
+        generated_code += ('    m[:, ' + str(rxn_ix) + '] = ' +
+                           VectorizeFormula(Monomial) + '\n')
+    generated_code += '    return m \n'
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def coefficient_fun( e, y ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    m = monomial_fun_batch(numpy.asarray(e)[None], '
+        'numpy.asarray(y)[None])[0] \n')
+    generated_code += (
+        '    return scipy.sparse.csc_matrix((S_kinetic.data * m[kinetic_cols], '
+        'S_kinetic.indices, S_kinetic.indptr), '
+        'shape=S_kinetic.shape).dot(G) \n')
+
+    # Coefficient matrix at the nominal state
+    A = compileSource(generated_code.encode(),
+                      'SciPyModel_NullSpace').coefficient_fun(
+        numpy.asarray(SciPyModel.Parameters.Value, dtype=float)[NonKineticIndex],
+        numpy.asarray(SciPyModel.Species.Value, dtype=float)).toarray()
+
+    # Rank-revealing selection of the pivot reactions. Each column is
+    # orthogonalized against an orthonormal basis of the accepted pivots
+    # (twice, for stability) and accepted if its residual is significant.
+    Norm = numpy.linalg.norm(A, axis=0)
+    A = A / numpy.where(Norm > 0, Norm, 1.)
+    if Tolerance == None:
+        Tolerance = max(A.shape) * numpy.finfo(float).eps
+    Threshold = Tolerance * max(numpy.linalg.norm(A, 2), 1.)
+    Pivot = []
+    Basis = numpy.zeros([A.shape[0], 0])
+    for rxn_ix in range(A.shape[1]):
+        Residual = A[:, rxn_ix]
+        for Pass in range(2):
+            Residual = Residual - Basis.dot(Basis.T.dot(Residual))
+        ResidualNorm = numpy.linalg.norm(Residual)
+        if ResidualNorm > Threshold:
+            Pivot.append(rxn_ix)
+            Basis = numpy.column_stack([Basis, Residual / ResidualNorm])
+    Free = [rxn_ix for rxn_ix in range(A.shape[1]) if rxn_ix not in Pivot]
+    SciPyModel.Parameters.NullSpaceDimension = len(Free)
+
+    # Write the nullspace functions
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += ('pivot_ix = numpy.array(' + repr(Pivot) +
+                       ', dtype=int) \n')
+    generated_code += ('free_ix = numpy.array(' + repr(Free) +
+                       ', dtype=int) \n')
+    generated_code += '\n'
+    generated_code += 'def nullspace_fun_batch( E, X ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    A = numpy.matmul(S_kinetic_dense[None, :, :] * '
+        'monomial_fun_batch(E, X)[:, None, :], G_dense) \n')
+    generated_code += (
+        '    N = numpy.zeros([A.shape[0], ' + str(NumKinetic) + ', ' +
+        str(len(Free)) + '], dtype=A.dtype) \n')
+    generated_code += (
+        '    N[:, free_ix, numpy.arange(' + str(len(Free)) + ')] = 1 \n')
+    generated_code += (
+        '    N[:, pivot_ix, :] = -numpy.matmul(numpy.linalg.pinv('
+        'A[:, :, pivot_ix]), A[:, :, free_ix]) \n')
+    generated_code += '    return N \n'
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def nullspace_fun( e, y ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    return nullspace_fun_batch(numpy.asarray(e)[None], '
+        'numpy.asarray(y)[None])[0] \n')
+
+    return bytearray(generated_code.encode())
@@ -0,0 +1,56 @@
+def createRandomGenerator(Seed=None):
+    '''
+        Create the random number generator used by the toolbox
+        samplers from a seed.
+
+        Parameters
+        ----------
+        Seed : None, int, numpy.random.SeedSequence or Generator
+            None draws fresh entropy from the operating system.
+            A numpy.random.Generator is returned unchanged so a
+            stream can be passed on.
+
+        Returns
+        -------
+        Generator : numpy.random.Generator
+
+        See Also
+        --------
+        spawnRandomGenerators
+    '''
+    import numpy
+
+    return numpy.random.default_rng(Seed)
+
+
+def spawnRandomGenerators(Seed, Number):
+    '''
+        Create Number statistically independent generators from
+        one seed, e.g. one per worker process or per sample of a
+        sensitivity analysis, so that results are reproducible
+        from Seed alone and the streams do not overlap.
+
+        Parameters
+        ----------
+        Seed : None, int or numpy.random.SeedSequence
+            Root of the streams.
+        Number : int
+            Number of generators.
+
+        Returns
+        -------
+        Generators : list
+
+        See Also
+        --------
+        createRandomGenerator
+
+        Notes
+        -----
+        Streams are spawned from numpy.random.SeedSequence.
+    '''
+    import numpy
+
+    if not isinstance(Seed, numpy.random.SeedSequence):
+        Seed = numpy.random.SeedSequence(Seed)
+    return [numpy.random.default_rng(Child) for Child in Seed.spawn(Number)]
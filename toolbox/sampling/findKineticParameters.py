@@ -0,0 +1,102 @@
+def findKineticParameters( SciPyModel ):
+    '''
+        Find the kinetic parameters of the model, i.e. rate
+        constants entering a reaction rate linearly as its
+        leading factor,
+
+            v_j = p[k] * m_j(y, p)
+
+        where the monomial m_j does not depend on p[k]. Each
+        rate law is parsed once and only its top-level chain of
+        products and quotients is inspected, so the pass scales
+        linearly with the size of the model.
+
+        To Do
+        -----
+        1. Allow kinetic parameters which are not the leading
+           factor, e.g. y[0] * p[1].
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires vectorized Reactions.Formulas.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with Parameters.KineticFlag set,
+            Reactions.KineticIndex holding the kinetic parameter
+            of every reaction or -1, and Reactions.Monomials
+            holding the vectorized formula of m_j or None.
+
+        See Also
+        --------
+        createNullSpaceFunction
+
+        Notes
+        -----
+        A leading parameter is only kinetic if it appears
+        nowhere else in the model. It may lead several
+        reactions, e.g. a production and a degradation sharing
+        one rate constant, which then all enter the steady state
+        condition through the same kinetic parameter.
+    '''
+    import re
+    from collections import Counter
+
+    # Number of uses of every parameter across all rate laws
+    Uses = Counter(int(p_ix) for Formula in SciPyModel.Reactions.Formulas
+                   for p_ix in re.findall(r'\bp\s*\[\s*(\d+)\s*\]', Formula))
+
+    # Leading parameter of every rate law and the number of reactions
+    # each parameter leads
+    Splits = [splitLeadingParameter(Formula)
+              for Formula in SciPyModel.Reactions.Formulas]
+    Leads = Counter(p_ix for p_ix, Monomial in Splits if p_ix != None)
+
+    SciPyModel.Parameters.KineticFlag = [False] * SciPyModel.Parameters.Quantity
+    SciPyModel.Reactions.KineticIndex = []
+    SciPyModel.Reactions.Monomials = []
+    for p_ix, Monomial in Splits:
+        if p_ix == None or Uses[p_ix] != Leads[p_ix]:
+            p_ix, Monomial = -1, None
+        else:
+            SciPyModel.Parameters.KineticFlag[p_ix] = True
+        SciPyModel.Reactions.KineticIndex.append(p_ix)
+        SciPyModel.Reactions.Monomials.append(Monomial)
+
+    return SciPyModel
+
+
+def splitLeadingParameter( Formula ):
+    '''
+        Return (i, Monomial) if the vectorized Formula is a
+        chain of products and quotients whose leftmost factor
+        is p[i], Monomial being Formula with that factor
+        replaced by 1. Otherwise return (None, None).
+    '''
+    import ast, re
+
+    Formula = Formula.strip()
+    try:
+        Node = ast.parse(Formula, mode='eval').body
+    except SyntaxError:
+        return None, None
+
+    # The leftmost operand of a product or quotient is in the numerator
+    while (isinstance(Node, ast.BinOp)
+           and isinstance(Node.op, (ast.Mult, ast.Div))):
+        Node = Node.left
+
+    if not (isinstance(Node, ast.Subscript) and isinstance(
+            Node.value, ast.Name) and Node.value.id == 'p'):
+        return None, None
+    Index = Node.slice
+    if isinstance(Index, getattr(ast, 'Index', ())):
+        Index = Index.value
+    Index = getattr(Index, 'n', getattr(Index, 'value', None))
+    if not isinstance(Index, int):
+        return None, None
+
+    Match = re.compile(r'p\s*\[\s*\d+\s*\]').match(Formula, Node.col_offset)
+    return Index, Formula[:Match.start()] + '1' + Formula[Match.end():]
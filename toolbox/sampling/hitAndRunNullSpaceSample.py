@@ -0,0 +1,276 @@
+def hitAndRunNullSpaceSample(SciPyModel, Thinning=10, BurnIn=100,
+                             NumChains=None, Processes=None, Seed=None):
+    '''
+        Sample the parameter sets which keep the steady state
+        condition and lie within MinimumValue and MaximumValue
+        by coordinate hit-and-run, so no draw is rejected for
+        leaving the bounds of the kinetic rate constants.
+
+        To Do
+        -----
+        1. Adapt the proposals of the non-kinetic parameters to
+           their acceptance rate.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that createNullSpaceFunction was called and
+            that Global.NumSamples and finite parameter bounds
+            are set.
+        Thinning : int, optional
+            Number of sweeps between kept samples, at least 1.
+            Defaults to 10.
+        BurnIn : int, optional
+            Number of sweeps discarded at the start of every
+            chain, at least 0. Defaults to 100.
+        NumChains : int, optional
+            Number of independent chains. Defaults to Processes.
+        Processes : int, optional
+            Number of worker processes. Defaults to the number
+            of CPUs. A value of 1 runs the chains in the current
+            process.
+        Seed : None, int or SeedSequence, optional
+            Root of the random streams of the chains, see
+            spawnRandomGenerators.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            Places the generated parameter set into the field
+            SciPyModel.SimulationData.Sensitivity.Global.ParameterSets
+            The number of proposals for the non-kinetic
+            parameters and the fraction accepted are placed into
+            Global.NumDraws and Global.AcceptanceRate.
+
+        See Also
+        --------
+        uniformNullSpaceSample, createNullSpaceFunction
+
+        Notes
+        -----
+        The target is the uniform distribution over the nullspace
+        coordinates g and non-kinetic parameters E with
+
+            MinimumValue <= k = N(E, X) g <= MaximumValue
+
+        as in uniformNullSpaceSample with Feasible set. For fixed
+        E the feasible g form a polytope, so every sweep moves
+        each nullspace coordinate to a uniform point of the
+        feasible chord through the current point, which only
+        needs the current column of N. Each free non-kinetic
+        parameter is then redrawn uniformly within its bounds
+        and kept if g stays feasible, a Metropolis step which
+        costs one evaluation of the nullspace function.
+
+        All chains start from the point of the largest relative
+        slack to the bounds of k at the nominal E, found by
+        scipy.optimize.linprog, and the nullspace source is
+        compiled once per worker process. Successive samples of
+        a chain are correlated, increase Thinning if the
+        estimates depend on their independence.
+
+        Non-kinetic parameters marked in Parameters.FixedFlag are
+        held at their Value.
+    '''
+    # Import required packages
+    import multiprocessing
+    import numpy
+    from toolbox.sampling.createRandomGenerator import spawnRandomGenerators
+
+    NumSamples = SciPyModel.SimulationData.Sensitivity.Global.NumSamples
+    KineticFlag = numpy.array(SciPyModel.Parameters.KineticFlag, dtype=bool)
+    NonKineticFlag = numpy.invert(KineticFlag)
+    FixedFlag = numpy.array(SciPyModel.Parameters.FixedFlag or
+                            [False] * SciPyModel.Parameters.Quantity,
+                            dtype=bool)[NonKineticFlag]
+    if SciPyModel.Parameters.NullSpaceDimension == 0:
+        print('ERROR: The nullspace of the kinetic parameters is empty.')
+        return
+    if Thinning < 1 or BurnIn < 0:
+        print('ERROR: Hit-and-run sampling requires Thinning >= 1 and '
+              'BurnIn >= 0.')
+        return
+
+    # Bounds of the kinetic rate constants and the non-kinetic parameters
+    Minimum = numpy.asarray(SciPyModel.Parameters.MinimumValue, dtype=float)
+    Maximum = numpy.asarray(SciPyModel.Parameters.MaximumValue, dtype=float)
+    Settings = {
+        'MinimumK': Minimum[KineticFlag],
+        'MaximumK': Maximum[KineticFlag],
+        'MinimumE': numpy.where(Minimum == 0., 1e-6, Minimum)[NonKineticFlag],
+        'MaximumE': numpy.where(Maximum == 0., 1e-6, Maximum)[NonKineticFlag],
+        'Free': numpy.flatnonzero(numpy.invert(FixedFlag)),
+        'Species': numpy.asarray(SciPyModel.Species.Value, dtype=float),
+        'Thinning': Thinning,
+        'BurnIn': BurnIn
+    }
+    if not (numpy.all(numpy.isfinite(Settings['MinimumK'])) and
+            numpy.all(numpy.isfinite(Settings['MaximumK']))):
+        print('ERROR: Hit-and-run sampling requires finite bounds of the '
+              'kinetic parameters.')
+        return
+
+    # Warm start at the nominal non-kinetic parameters
+    StartE = numpy.clip(
+        numpy.asarray(SciPyModel.Parameters.Value, dtype=float)[NonKineticFlag],
+        Settings['MinimumE'], Settings['MaximumE'])
+    StartE[numpy.isnan(StartE)] = (0.5 * (Settings['MinimumE'] +
+                                          Settings['MaximumE']))[
+                                              numpy.isnan(StartE)]
+    StartG = findMaximumSlackPoint(
+        SciPyModel.ToolboxFunctions.NullSpaceFunction(StartE,
+                                                      Settings['Species']),
+        Settings['MinimumK'], Settings['MaximumK'])
+    if StartG is None:
+        print('ERROR: No nullspace point within the bounds of the kinetic '
+              'parameters was found at the nominal non-kinetic parameters.')
+        return
+
+    if Processes == None:
+        Processes = multiprocessing.cpu_count()
+    if NumChains == None:
+        NumChains = Processes
+    NumChains = max(1, min(NumChains, NumSamples))
+    Tasks = [(Generator, StartG, StartE,
+              len(range(c_ix, NumSamples, NumChains)))
+             for c_ix, Generator in enumerate(
+                 spawnRandomGenerators(Seed, NumChains))]
+
+    Source = bytes(SciPyModel.ToolboxFunctions.NullSpaceSource)
+    if Processes == 1 or NumChains == 1:
+        initializeChainWorker(Source, Settings)
+        Results = [runNullSpaceChain(Task) for Task in Tasks]
+        ChainState.clear()
+    else:
+        Pool = multiprocessing.Pool(min(Processes, NumChains),
+                                    initializeChainWorker, (Source, Settings))
+        try:
+            Results = Pool.map(runNullSpaceChain, Tasks)
+        finally:
+            Pool.terminate()
+            Pool.join()
+
+    # Interleave the chains and place kinetic and non-kinetic parameters
+    # into their columns
+    ParameterSets = numpy.empty([NumSamples, SciPyModel.Parameters.Quantity])
+    for c_ix, Result in enumerate(Results):
+        ParameterSets[c_ix::NumChains, KineticFlag] = Result[0]
+        ParameterSets[c_ix::NumChains, NonKineticFlag] = Result[1]
+    NumDraws = sum(Result[2] for Result in Results)
+
+    Global = SciPyModel.SimulationData.Sensitivity.Global
+    Global.ParameterSets = ParameterSets
+    Global.NumDraws = NumDraws
+    Global.AcceptanceRate = (sum(Result[3] for Result in Results) /
+                             float(max(NumDraws, 1)))
+
+    return SciPyModel
+
+
+def findMaximumSlackPoint(NullSpace, MinimumK, MaximumK):
+    '''
+        Return the nullspace coordinates g maximizing the slack
+        s of MinimumK + s w <= NullSpace g <= MaximumK - s w,
+        with w the width of the bounds, by linear programming,
+        or None if no g with positive slack exists.
+    '''
+    import numpy
+    from scipy.optimize import linprog
+
+    Width = numpy.maximum(MaximumK - MinimumK, 1e-12)
+    Dimension = NullSpace.shape[1]
+
+    # Variables [g, s], maximize s
+    Cost = numpy.zeros(Dimension + 1)
+    Cost[-1] = -1.
+    Result = linprog(Cost,
+                     A_ub=numpy.vstack([
+                         numpy.hstack([-NullSpace, Width[:, None]]),
+                         numpy.hstack([NullSpace, Width[:, None]])]),
+                     b_ub=numpy.concatenate([-MinimumK, MaximumK]),
+                     bounds=[(None, None)] * Dimension + [(0, 0.5)])
+    if Result.status != 0 or Result.x[-1] <= 0:
+        return None
+
+    return Result.x[:-1]
+
+
+# Compiled nullspace function and settings held by each worker process
+ChainState = {}
+
+
+def initializeChainWorker(Source, Settings):
+    '''
+        Pool initializer. Compiles the nullspace source once per
+        worker process.
+    '''
+    from toolbox.simulation.compileODEFunction import compileSource
+
+    ChainState['Module'] = compileSource(Source, 'SciPyModel_NullSpace')
+    ChainState.update(Settings)
+
+
+def runNullSpaceChain(Task):
+    '''
+        Run one coordinate hit-and-run chain. Runs inside a
+        worker process and returns the (samples x kinetic) and
+        (samples x non-kinetic) parameter sets with the number
+        of proposed and accepted non-kinetic moves.
+    '''
+    import numpy
+
+    Generator, g, E, NumSamples = Task
+    g = numpy.array(g, dtype=float)
+    E = numpy.array(E, dtype=float)
+    NullSpaceFunction = ChainState['Module'].nullspace_fun
+    MinimumK, MaximumK = ChainState['MinimumK'], ChainState['MaximumK']
+    MinimumE, MaximumE = ChainState['MinimumE'], ChainState['MaximumE']
+    Free = ChainState['Free']
+    Species = ChainState['Species']
+
+    NullSpace = NullSpaceFunction(E, Species)
+    KSets = numpy.empty([NumSamples, len(MinimumK)])
+    ESets = numpy.empty([NumSamples, len(E)])
+    NumDraws = 0
+    NumAccepted = 0
+    NumSweeps = ChainState['BurnIn'] + NumSamples * ChainState['Thinning']
+    for Sweep in range(NumSweeps):
+
+        # Move each nullspace coordinate uniformly along its feasible
+        # chord, t_min <= t <= t_max for k + t N[:, i] within bounds
+        k = NullSpace.dot(g)
+        for g_ix in Generator.permutation(len(g)):
+            Column = NullSpace[:, g_ix]
+            Moving = numpy.abs(Column) > 1e-12 * numpy.abs(Column).max()
+            if not numpy.any(Moving):
+                continue
+            Lower = (MinimumK - k)[Moving] / Column[Moving]
+            Upper = (MaximumK - k)[Moving] / Column[Moving]
+            TMinimum = numpy.max(numpy.minimum(Lower, Upper))
+            TMaximum = numpy.min(numpy.maximum(Lower, Upper))
+            if not TMinimum < TMaximum:
+                continue
+            t = Generator.uniform(TMinimum, TMaximum)
+            g[g_ix] += t
+            k += t * Column
+
+        # Metropolis moves of the free non-kinetic parameters, which
+        # change the nullspace itself
+        for e_ix in Generator.permutation(Free):
+            Proposal = E.copy()
+            Proposal[e_ix] = Generator.uniform(MinimumE[e_ix], MaximumE[e_ix])
+            ProposalNullSpace = NullSpaceFunction(Proposal, Species)
+            ProposalK = ProposalNullSpace.dot(g)
+            NumDraws += 1
+            if (numpy.all(numpy.isfinite(ProposalK)) and
+                    numpy.all(ProposalK >= MinimumK) and
+                    numpy.all(ProposalK <= MaximumK)):
+                E, NullSpace = Proposal, ProposalNullSpace
+                NumAccepted += 1
+
+        Kept = Sweep + 1 - ChainState['BurnIn']
+        if Kept > 0 and Kept % ChainState['Thinning'] == 0:
+            KSets[Kept // ChainState['Thinning'] - 1] = NullSpace.dot(g)
+            ESets[Kept // ChainState['Thinning'] - 1] = E
+
+    return KSets, ESets, NumDraws, NumAccepted
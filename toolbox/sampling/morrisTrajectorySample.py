@@ -0,0 +1,93 @@
+def morrisTrajectorySample(SciPyModel, NumLevels=4, Seed=None):
+    '''
+        Create Morris one-at-a-time trajectories through the
+        parameter space as defined by the MinimumValue and
+        MaximumValue vectors, for the elementary effects
+        screening of calculateElementaryEffects.
+
+        To Do
+        -----
+        1. Trajectory selection for maximal spread (Campolongo
+           et al. 2007).
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires the parameter bounds and the number of
+            trajectories in
+            SciPyModel.SimulationData.Sensitivity.Global.NumSamples.
+        NumLevels : int, optional
+            Number of grid levels p of each parameter range. Should
+            be even.
+        Seed : None, int, SeedSequence or generator, optional
+            Seed or generator of the random stream, see
+            createRandomGenerator. Defaults to fresh entropy.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            Places the (trajectories * (k + 1) x parameters)
+            trajectory points, k being the number of parameters
+            not marked in Parameters.FixedFlag, into the field
+            SciPyModel.SimulationData.Sensitivity.Global.ParameterSets
+            The (trajectories x k) index of the parameter moved in
+            every step and its signed step in the unit hypercube
+            are placed into Global.MovedParameter and
+            Global.UnitStep.
+
+        See Also
+        --------
+        calculateElementaryEffects, uniformLatinHypercubeSample
+
+        Notes
+        -----
+        Each trajectory starts from a random point of the p-level
+        grid and moves every free parameter once, in random order
+        and direction, by Delta = p / (2 (p - 1)) of its range
+        (Morris 1991). Fixed parameters are held at their Value.
+    '''
+    import numpy
+    from toolbox.sampling.createRandomGenerator import createRandomGenerator
+
+    Global = SciPyModel.SimulationData.Sensitivity.Global
+    NumParameters = SciPyModel.Parameters.Quantity
+    FixedFlag = numpy.array(
+        SciPyModel.Parameters.FixedFlag or [False] * NumParameters, dtype=bool)
+    Free = numpy.flatnonzero(numpy.invert(FixedFlag))
+    NumFree = len(Free)
+    Delta = NumLevels / (2. * (NumLevels - 1))
+    Generator = createRandomGenerator(Seed)
+
+    # Random base points, shifted up by Delta where the trajectory moves
+    # down so every point stays on the unit grid
+    Direction = Generator.choice([-1., 1.], [Global.NumSamples, NumFree])
+    Start = numpy.floor(Generator.uniform(0, NumLevels // 2, [
+        Global.NumSamples, NumFree
+    ])) / (NumLevels - 1) + Delta * (Direction < 0)
+
+    # Move one parameter per step in a random order
+    Order = numpy.argsort(
+        Generator.uniform(0, 1, [Global.NumSamples, NumFree]), axis=1)
+    Steps = numpy.zeros([Global.NumSamples, NumFree + 1, NumFree])
+    for s_ix in range(NumFree):
+        Column = Order[:, s_ix]
+        Steps[numpy.arange(Global.NumSamples), s_ix + 1, Column] = (
+            Delta * Direction[numpy.arange(Global.NumSamples), Column])
+    Points = Start[:, None, :] + numpy.cumsum(Steps, axis=1)
+
+    # Record the moved parameter of every step, which can not be told
+    # from the points if its bounds coincide
+    Global.MovedParameter = Free[Order]
+    Global.UnitStep = Delta * numpy.take_along_axis(Direction, Order, axis=1)
+
+    # Scale the free parameters to their bounds
+    Minimum = numpy.asarray(SciPyModel.Parameters.MinimumValue, dtype=float)
+    Maximum = numpy.asarray(SciPyModel.Parameters.MaximumValue, dtype=float)
+    Global.ParameterSets = numpy.tile(
+        numpy.asarray(SciPyModel.Parameters.Value, dtype=float),
+        [Global.NumSamples * (NumFree + 1), 1])
+    Global.ParameterSets[:, Free] = Minimum[Free] + Points.reshape(
+        Global.ParameterSets.shape[0], NumFree) * (Maximum[Free] -
+                                                    Minimum[Free])
+
+    return SciPyModel
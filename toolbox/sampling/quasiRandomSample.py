@@ -0,0 +1,198 @@
+def quasiRandomSample(SciPyModel, Method='sobol', Scramble=True,
+                      LogScale=False, Replicates=1, Seed=None):
+    '''
+        Create a quasi-random (low-discrepancy) sample of the
+        parameter space as defined by the MinimumValue and
+        MaximumValue vectors.
+
+        To Do
+        -----
+        1. Add conditional check to inform user if required
+           inputs are not specified in SciPyModel.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires Parameters.MinimumValue, MaximumValue and
+            Global.NumSamples.
+        Method : str, optional
+            'sobol' (default) or 'halton'.
+        Scramble : bool, optional
+            Randomize the sequence by scrambling, which keeps its
+            low discrepancy but makes independent replicates
+            possible. Defaults to True.
+        LogScale : bool or list of bool, optional
+            Spread the points uniformly in log10 between the
+            bounds, for all parameters or for those flagged in a
+            list of length Parameters.Quantity.
+        Replicates : int, optional
+            Number of NumSamples x parameters designs to draw
+            from one sequence of Replicates times the dimension.
+            Defaults to 1.
+        Seed : None, int, SeedSequence or generator, optional
+            Seed or generator of the scrambling, see
+            createRandomGenerator. Defaults to fresh entropy.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            Places the generated parameter set into the field
+            SciPyModel.SimulationData.Sensitivity.Global.ParameterSets
+            with the Replicates designs stacked as row blocks, or
+            None there if the inputs are invalid.
+
+        See Also
+        --------
+        iterQuasiRandomSample, uniformLatinHypercubeSample,
+        calculateGlobalSensitivities
+
+        Notes
+        -----
+        The sequences are generated by scipy.stats.qmc, which
+        requires SciPy 1.7 or later. Sobol points are only
+        balanced if NumSamples is a power of 2.
+
+        For calculateGlobalSensitivities pass
+
+            functools.partial(quasiRandomSample, Replicates=2)
+
+        as the Sampler, so the base samples A and B are the two
+        halves of one sequence. Two independently scrambled
+        copies of the same d-dimensional sequence are strongly
+        correlated row by row, which inflates the variance of
+        the Sobol index estimates beyond that of random
+        sampling. From one 2d-dimensional sequence, every AB_i
+        is itself a low-discrepancy design.
+
+        Parameters marked in Parameters.FixedFlag are held at
+        their Value and take no dimension of the sequence.
+    '''
+    Draw = createQuasiRandomDraw(SciPyModel, Method, Scramble, LogScale,
+                                 Replicates, Seed)
+    if Draw == None:
+        SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = None
+        return SciPyModel
+
+    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = Draw(
+        SciPyModel.SimulationData.Sensitivity.Global.NumSamples).reshape(
+            -1, SciPyModel.Parameters.Quantity)
+
+    return SciPyModel
+
+
+def iterQuasiRandomSample(SciPyModel, NumSamples=None, ChunkSize=2**16,
+                          Method='sobol', Scramble=True, LogScale=False,
+                          Seed=None):
+    '''
+        Generate a quasi-random sample of the parameter space in
+        chunks, so that very large sweeps never hold the whole
+        set of parameter sets in memory.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            See quasiRandomSample.
+        NumSamples : int, optional
+            Total number of parameter sets. Defaults to
+            Global.NumSamples.
+        ChunkSize : int, optional
+            Number of parameter sets per chunk. Defaults to 2**16.
+        Method, Scramble, LogScale, Seed : optional
+            See quasiRandomSample.
+
+        Returns
+        -------
+        Chunks : generator
+            Yields (ChunkSize x Parameters.Quantity) arrays, the
+            last one possibly shorter, which together form one
+            sequence of NumSamples points.
+
+        See Also
+        --------
+        quasiRandomSample
+
+        Notes
+        -----
+        Successive chunks continue the same sequence, so the
+        union of the chunks is exactly the design quasiRandomSample
+        returns for the same Seed. Choose ChunkSize and
+        NumSamples as powers of 2 for balanced Sobol points.
+    '''
+    Draw = createQuasiRandomDraw(SciPyModel, Method, Scramble, LogScale, 1,
+                                 Seed)
+    if Draw == None:
+        return
+    if NumSamples == None:
+        NumSamples = SciPyModel.SimulationData.Sensitivity.Global.NumSamples
+
+    def Chunks():
+        for Start in range(0, NumSamples, ChunkSize):
+            yield Draw(min(ChunkSize, NumSamples - Start))[0]
+
+    return Chunks()
+
+
+def createQuasiRandomDraw(SciPyModel, Method, Scramble, LogScale, Replicates,
+                          Seed):
+    '''
+        Return a function Draw( n ) returning the next n points
+        of one low-discrepancy sequence as a (Replicates x n x
+        parameters) array scaled to the parameter bounds, or
+        None if the inputs are invalid.
+    '''
+    import numpy
+    from toolbox.sampling.createRandomGenerator import createRandomGenerator
+
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        print('ERROR: Quasi-random sampling requires scipy.stats.qmc '
+              '(SciPy 1.7 or later).')
+        return
+
+    NumParameters = SciPyModel.Parameters.Quantity
+    FixedFlag = numpy.array(SciPyModel.Parameters.FixedFlag or
+                            [False] * NumParameters, dtype=bool)
+    Free = numpy.flatnonzero(numpy.invert(FixedFlag))
+    LogFlag = numpy.zeros(NumParameters, dtype=bool)
+    LogFlag[:] = LogScale
+
+    # Bounds of the free parameters, in log10 where requested
+    Minimum = numpy.asarray(SciPyModel.Parameters.MinimumValue, dtype=float)
+    Maximum = numpy.asarray(SciPyModel.Parameters.MaximumValue, dtype=float)
+    if numpy.any(LogFlag[Free] & ((Minimum[Free] <= 0) | (Maximum[Free] <= 0))):
+        print('ERROR: Log-scaled parameter bounds must be positive.')
+        return
+    LogFree = LogFlag[Free]
+    Lower = Minimum[Free]
+    Upper = Maximum[Free]
+    Lower[LogFree] = numpy.log10(Lower[LogFree])
+    Upper[LogFree] = numpy.log10(Upper[LogFree])
+
+    Generator = createRandomGenerator(Seed)
+    NumDimensions = Replicates * len(Free)
+    if Method == 'sobol':
+        Engine = qmc.Sobol(NumDimensions, scramble=Scramble, seed=Generator)
+    elif Method == 'halton':
+        Engine = qmc.Halton(NumDimensions, scramble=Scramble, seed=Generator)
+    else:
+        print('ERROR: Unknown quasi-random Method ' + repr(Method) +
+              ', expected sobol or halton.')
+        return
+
+    Nominal = numpy.asarray(SciPyModel.Parameters.Value, dtype=float)
+
+    def Draw(NumSamples):
+        # Split the dimensions of the sequence into the replicates
+        Points = Engine.random(NumSamples).reshape(
+            NumSamples, Replicates, len(Free)).transpose(1, 0, 2)
+        Points = Lower + Points * (Upper - Lower)
+        Points[:, :, LogFree] = 10**Points[:, :, LogFree]
+
+        # Hold parameters marked as fixed at their nominal value
+        ParameterSets = numpy.empty([Replicates, NumSamples, NumParameters])
+        ParameterSets[:, :, Free] = Points
+        ParameterSets[:, :, FixedFlag] = Nominal[FixedFlag]
+        return ParameterSets
+
+    return Draw
@@ -1,4 +1,4 @@
-def uniformLatinHypercubeSample(SciPyModel):
+def uniformLatinHypercubeSample(SciPyModel, Seed=None):
     ''' 
         Create a uniform Latin-Hypercube sample of the parameter 
         space as defined by the MinimumValue and MaximumValue
@@ -11,6 +11,9 @@ def uniformLatinHypercubeSample(SciPyModel):
         ----------
         SciPyModel : internal object instance
             Requires that 
+        Seed : None, int, SeedSequence or generator, optional
+            Seed or generator of the random stream, see
+            createRandomGenerator. Defaults to fresh entropy.
         
         Returns
         -------
@@ -26,31 +29,55 @@ def uniformLatinHypercubeSample(SciPyModel):
         -----
         Be advised the resulting parameterization will not
         remain at the desired steady state condition.
+
+        Parameters marked in Parameters.FixedFlag are held at
+        their Value.
+
+        All columns are stratified at once by an argsort of a
+        random matrix, see createLatinHypercube. Independent
+        designs for parallel workers are obtained by passing
+        each worker one of the generators returned by
+        spawnRandomGenerators.
     '''
 
     import numpy
+    from toolbox.sampling.createRandomGenerator import createRandomGenerator
+
+    # Unit hypercube design scaled to the parameter bounds
+    Minimum = numpy.asarray(SciPyModel.Parameters.MinimumValue, dtype=float)
+    Maximum = numpy.asarray(SciPyModel.Parameters.MaximumValue, dtype=float)
+    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = (
+        Minimum + createLatinHypercube(
+            createRandomGenerator(Seed),
+            SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
+            SciPyModel.Parameters.Quantity) * (Maximum - Minimum))
+
+    # Hold parameters marked as fixed at their nominal value
+    FixedFlag = numpy.array(SciPyModel.Parameters.FixedFlag or
+                            [False] * SciPyModel.Parameters.Quantity,
+                            dtype=bool)
+    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets[:, FixedFlag] = (
+        numpy.asarray(SciPyModel.Parameters.Value, dtype=float)[FixedFlag])
+
+    return SciPyModel
+
+
+def createLatinHypercube(Generator, NumSamples, NumDimensions):
+    '''
+        Return a (NumSamples x NumDimensions) Latin hypercube
+        design of the unit cube drawn from Generator. Every
+        dimension is divided into NumSamples strata, each holding
+        exactly one uniformly placed point.
+    '''
+    import numpy
+
+    # One random permutation of the strata per dimension, all computed
+    # by a single argsort along the rows of a (dimensions x samples)
+    # matrix, which keeps the memory access contiguous
+    Design = numpy.argsort(
+        Generator.uniform(0, 1, [NumDimensions, NumSamples]),
+        axis=1).astype(float)
+    Design += Generator.uniform(0, 1, [NumDimensions, NumSamples])
+    Design /= NumSamples
 
-    # Uniform random sample array
-    RanSet = numpy.random.uniform(0, 1, [
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity
-    ])
-
-    # Initialization of sample array
-    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = numpy.zeros([
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity
-    ])
-
-    # For loop to divide sample space and ensure conditions are met
-    for x_idx in range(SciPyModel.Parameters.Quantity):
-        idx = numpy.random.permutation(
-            SciPyModel.SimulationData.Sensitivity.Global.NumSamples) + 1
-        P = (numpy.transpose(idx) - RanSet[:, x_idx]
-             ) / SciPyModel.SimulationData.Sensitivity.Global.NumSamples
-        SciPyModel.SimulationData.Sensitivity.Global.ParameterSets[:, x_idx] = (
-            SciPyModel.Parameters.MinimumValue[x_idx] + P *
-            (SciPyModel.Parameters.MaximumValue[x_idx] -
-             SciPyModel.Parameters.MinimumValue[x_idx]))
-
-    return SciPyModel
\ No newline at end of file
+    return Design.T
\ No newline at end of file
@@ -1,4 +1,5 @@
-def uniformNullSpaceSample(SciPyModel):
+def uniformNullSpaceSample(SciPyModel, Seed=None, Feasible=False,
+                           MaximumDraws=None):
     ''' 
         Create a sample of the parameter space as defined 
         by the MinimumValue and MaximumValue vectors.
@@ -14,29 +15,52 @@ def uniformNullSpaceSample(SciPyModel):
         ----------
         SciPyModel : internal object instance
             Requires that 
+        Seed : None, int, SeedSequence or generator, optional
+            Seed or generator of the random stream, see
+            createRandomGenerator. Defaults to fresh entropy.
+        Feasible : bool, optional
+            Reject parameter sets whose kinetic rate constants
+            fall outside MinimumValue and MaximumValue and keep
+            drawing until NumSamples feasible sets are found.
+        MaximumDraws : int, optional
+            Upper limit on the number of sets drawn with
+            Feasible set. Defaults to 1000 x NumSamples. If fewer
+            than NumSamples feasible sets are found within this
+            limit an error is printed and Global.ParameterSets is
+            set to None.
         
         Returns
         -------
         SciPyModel : internal object instance
             Places the generated parameter set into the field
             SciPyModel.SimulationData.Sensitivity.Global.ParameterSets
+            The number of sets drawn and the fraction of them
+            with feasible kinetic rate constants are placed into
+            Global.NumDraws and Global.AcceptanceRate.
             
         See Also
         --------
-        sampleLHSU
+        sampleLHSU, hitAndRunNullSpaceSample
         
         Notes
         -----
-        
+        The nullspace is evaluated for all samples at once by
+        the batched function generated by
+        createNullSpaceFunction.
+
+        With Feasible set the first batch holds NumSamples sets
+        and every further batch is sized from the acceptance
+        rate observed so far, so typically one or two extra
+        batches complete the sample. The accepted sets are not
+        jointly a Latin hypercube.
+
+        Non-kinetic parameters marked in Parameters.FixedFlag are
+        held at their Value. Kinetic parameters follow from the
+        nullspace and can not be fixed.
     '''
     # Import required packages
     import numpy
-
-    # Initialize ParameterSets array
-    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = numpy.zeros([
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity
-    ])
+    from toolbox.sampling.createRandomGenerator import createRandomGenerator
 
     # Get minimum bound of Michaelis constants
     MinimumEBound = SciPyModel.Parameters.MinimumValue[[
@@ -76,59 +100,113 @@ def uniformNullSpaceSample(SciPyModel):
     MinimumBound = numpy.concatenate([MinimumGBound, MinimumEBound])
     MaximumBound = numpy.concatenate([MaximumGBound, MaximumEBound])
 
-    # Uniform random sample array
-    RanSet = numpy.random.uniform(0, 1, [
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity - sum(SciPyModel.Parameters.KineticFlag)
-        + SciPyModel.Parameters.NullSpaceDimension
-    ])
-
-    # Initialization of sample array
-    PreParameterSets = numpy.zeros([
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity - sum(SciPyModel.Parameters.KineticFlag)
-        + SciPyModel.Parameters.NullSpaceDimension
-    ])
-
-    # For loop to divide sample space and ensure conditions are met
-    for x_idx in range(SciPyModel.Parameters.Quantity -
-                       sum(SciPyModel.Parameters.KineticFlag) +
-                       SciPyModel.Parameters.NullSpaceDimension):
-        idx = numpy.random.permutation(
-            SciPyModel.SimulationData.Sensitivity.Global.NumSamples) + 1
-        P = (numpy.transpose(idx) - RanSet[:, x_idx]
-             ) / SciPyModel.SimulationData.Sensitivity.Global.NumSamples
-        PreParameterSets[:, x_idx] = (
-            MinimumBound[x_idx] + P *
-            (MaximumBound[x_idx] - MinimumBound[x_idx]))
-
-    # Initialize colelction array
-    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = (numpy.empty([
-        SciPyModel.SimulationData.Sensitivity.Global.NumSamples,
-        SciPyModel.Parameters.Quantity
-    ]))
-
-    # Loop over each sample
-    for i in range(SciPyModel.SimulationData.Sensitivity.Global.NumSamples):
-
-        # Calculate kinetic rate constants based on current sample
-        KSample = SciPyModel.ToolboxFunctions.NullSpaceFunction(
-            list(PreParameterSets[i,
-                                  SciPyModel.Parameters.NullSpaceDimension:]),
-            list(SciPyModel.Species.Value)).dot(
-                list(PreParameterSets[
-                    i, :SciPyModel.Parameters.NullSpaceDimension]))
-
-        # Check if kinetic rate constant
-        if ((KSample < SciPyModel.Parameters.
-             MinimumValue[SciPyModel.Parameters.KineticFlag]).any()
-                or (KSample > SciPyModel.Parameters.
-                    MaximumValue[SciPyModel.Parameters.KineticFlag]).any()):
-            pass
-
-        SciPyModel.SimulationData.Sensitivity.Global.ParameterSets[i, :] = (
-            numpy.concatenate([
-                KSample.tolist()[0], PreParameterSets[
-                    i, SciPyModel.Parameters.NullSpaceDimension:].tolist()
-            ]))
+    Generator = createRandomGenerator(Seed)
+    NumSamples = SciPyModel.SimulationData.Sensitivity.Global.NumSamples
+    if MaximumDraws == None:
+        MaximumDraws = 1000 * NumSamples
+
+    if not Feasible:
+        ParameterSets, Valid = drawNullSpaceSample(
+            SciPyModel, Generator, NumSamples, MinimumBound, MaximumBound)
+        NumDraws = NumSamples
+        NumValid = numpy.sum(Valid)
+    else:
+        # Oversample in batches sized by the acceptance rate observed so
+        # far until NumSamples feasible parameter sets were collected
+        Accepted = []
+        NumAccepted = 0
+        NumDraws = 0
+        NumValid = 0
+        BatchSize = NumSamples
+        while NumAccepted < NumSamples:
+            if NumDraws >= MaximumDraws:
+                break
+            BatchSize = min(BatchSize, MaximumDraws - NumDraws)
+            Batch, Valid = drawNullSpaceSample(
+                SciPyModel, Generator, BatchSize, MinimumBound, MaximumBound)
+            NumDraws += BatchSize
+            NumValid += numpy.sum(Valid)
+            Accepted.append(Batch[Valid][:NumSamples - NumAccepted])
+            NumAccepted += len(Accepted[-1])
+
+            # Expected draws for the remaining samples with a 10% margin,
+            # growing at most tenfold while no sample is accepted
+            BatchSize = int(min(
+                numpy.ceil(1.1 * (NumSamples - NumAccepted) * NumDraws /
+                           max(NumValid, 1)), 10 * BatchSize))
+        ParameterSets = numpy.vstack(Accepted)
+
+    SciPyModel.SimulationData.Sensitivity.Global.NumDraws = NumDraws
+    SciPyModel.SimulationData.Sensitivity.Global.AcceptanceRate = (
+        NumValid / float(NumDraws))
+
+    # Never return a sample smaller than requested
+    if len(ParameterSets) < NumSamples:
+        print('ERROR: Only ' + str(len(ParameterSets)) + ' of ' +
+              str(NumSamples) + ' feasible samples were found in ' +
+              str(NumDraws) + ' draws. Increase MaximumDraws or use '
+              'hitAndRunNullSpaceSample.')
+        SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = None
+        return SciPyModel
+
+    SciPyModel.SimulationData.Sensitivity.Global.ParameterSets = ParameterSets
+
     return SciPyModel
+
+
+def drawNullSpaceSample(SciPyModel, Generator, NumSamples, MinimumBound,
+                        MaximumBound):
+    '''
+        Draw NumSamples parameter sets as a Latin hypercube
+        sample of the nullspace coordinates and non-kinetic
+        parameters between MinimumBound and MaximumBound.
+        Returns the (NumSamples x parameters) sets and a boolean
+        vector flagging those whose kinetic rate constants are
+        finite and within the parameter bounds.
+    '''
+    import numpy
+    from toolbox.sampling.uniformLatinHypercubeSample import (
+        createLatinHypercube)
+
+    # Latin hypercube sample of the nullspace coordinates and the
+    # non-kinetic parameters
+    PreParameterSets = MinimumBound + createLatinHypercube(
+        Generator, NumSamples, len(MinimumBound)) * (MaximumBound -
+                                                     MinimumBound)
+
+    # Hold non-kinetic parameters marked as fixed at their nominal value
+    NonKineticFlag = numpy.invert(
+        numpy.array(SciPyModel.Parameters.KineticFlag, dtype=bool))
+    FixedFlag = numpy.array(SciPyModel.Parameters.FixedFlag or
+                            [False] * SciPyModel.Parameters.Quantity,
+                            dtype=bool)[NonKineticFlag]
+    ESets = PreParameterSets[:, SciPyModel.Parameters.NullSpaceDimension:]
+    ESets[:, FixedFlag] = numpy.asarray(
+        SciPyModel.Parameters.Value, dtype=float)[NonKineticFlag][FixedFlag]
+
+    # Evaluate the nullspace of every sample in one call and form the
+    # kinetic rate constants k = N(E, X) g
+    NullSpaceModule = SciPyModel.ToolboxFunctions.NullSpaceModule
+    NullSpaces = NullSpaceModule.nullspace_fun_batch(
+        ESets, numpy.broadcast_to(
+            numpy.asarray(SciPyModel.Species.Value, dtype=float),
+            (ESets.shape[0], SciPyModel.Species.Quantity)))
+    KSets = numpy.einsum(
+        'nkd,nd->nk', NullSpaces,
+        PreParameterSets[:, :SciPyModel.Parameters.NullSpaceDimension])
+
+    # Place kinetic and non-kinetic parameters into their columns
+    ParameterSets = numpy.empty([NumSamples, SciPyModel.Parameters.Quantity])
+    ParameterSets[:, numpy.invert(NonKineticFlag)] = KSets
+    ParameterSets[:, NonKineticFlag] = ESets
+
+    # Check the kinetic rate constants against their bounds
+    KineticFlag = numpy.invert(NonKineticFlag)
+    with numpy.errstate(invalid='ignore'):
+        Valid = (numpy.isfinite(KSets).all(axis=1) & (
+            KSets >= numpy.asarray(SciPyModel.Parameters.MinimumValue,
+                                   dtype=float)[KineticFlag]).all(axis=1) & (
+            KSets <= numpy.asarray(SciPyModel.Parameters.MaximumValue,
+                                   dtype=float)[KineticFlag]).all(axis=1))
+
+    return ParameterSets, Valid
@@ -1,12 +1,13 @@
-from importSBMLFile import importSBMLFile
+from .importSBMLFile import importSBMLFile
+from .batchImportSBMLFiles import batchImportSBMLFiles, iterImportSBMLFiles
 
 
 
 
 
 # Testing
-from cleanSBMLFile import cleanSBMLFile
-from compareModels import compareModels
-from convertSBML2Antimony import convertSBML2Antimony
-import printSBMLMath
-import promoteParameters
\ No newline at end of file
+from .cleanSBMLFile import cleanSBMLFile
+from .compareModels import compareModels
+from .convertSBML2Antimony import convertSBML2Antimony
+from . import printSBMLMath
+from . import promoteParameters
\ No newline at end of file
@@ -0,0 +1,221 @@
+def findSBMLFiles( Source ):
+    '''
+        Expand Source into a sorted list of SBML file paths.
+        Source may be a directory (searched recursively for
+        .xml and .sbml files), a glob pattern, a single file
+        path or a list of any of these.
+    '''
+    import os, glob
+
+    if not isinstance(Source, (list, tuple)):
+        Source = [Source]
+
+    FilePaths = []
+    for Entry in Source:
+        if os.path.isdir(Entry):
+            for Root, Directories, FileNames in os.walk(Entry):
+                Directories.sort()
+                FilePaths.extend(
+                    os.path.join(Root, FileName) for FileName in sorted(FileNames)
+                    if FileName.lower().endswith(('.xml', '.sbml')))
+        elif os.path.isfile(Entry):
+            FilePaths.append(Entry)
+        else:
+            FilePaths.extend(sorted(glob.glob(Entry)))
+
+    return FilePaths
+
+
+def importWorker( Arguments ):
+    '''
+        Import a single SBML file. Runs inside a worker process
+        and returns plain picklable data:
+
+        (FilePath, MetaData, Arrays, Error, Seconds)
+    '''
+    import time
+    import toolbox
+    from toolbox.sbml.modelCache import packSciPyModel
+
+    FilePath, CacheDirectory, StoichiometryFormat = Arguments
+    StartTime = time.time()
+
+    try:
+        SciPyModel = toolbox.createSciPyModel()
+        SciPyModel.MetaData.FilePath = FilePath
+        SciPyModel.MetaData.CacheDirectory = CacheDirectory
+        SciPyModel.Reactions.StoichiometryFormat = StoichiometryFormat
+        SciPyModel = toolbox.sbml.importSBMLFile(SciPyModel)
+        MetaData, Arrays = packSciPyModel(SciPyModel)
+    except Exception as Error:
+        return (FilePath, None, None, '%s: %s' % (type(Error).__name__, Error),
+                time.time() - StartTime)
+
+    return FilePath, MetaData, Arrays, None, time.time() - StartTime
+
+
+def iterImportSBMLFiles( Source, Processes=None, CacheDirectory=None,
+                         StoichiometryFormat='dense' ):
+    '''
+        Import every SBML file found in Source on a pool of
+        worker processes and yield results as they finish.
+
+        Parameters
+        ----------
+        Source : str or list of str
+            Directory, glob pattern or file path(s). See
+            findSBMLFiles.
+        Processes : int, optional
+            Number of worker processes. Defaults to the number
+            of CPUs. A value of 1 imports in the current process.
+        CacheDirectory : str, optional
+            Model cache directory passed to importSBMLFile.
+        StoichiometryFormat : str, optional
+            'dense', 'csr' or 'csc'. Format of the stoichiometry
+            matrix of every imported model. Defaults to 'dense'.
+
+        Yields
+        ------
+        (FilePath, Result, Seconds) : tuple
+            Result is the imported SciPyModel, or an Exception
+            describing why the file could not be imported.
+    '''
+    import multiprocessing
+    import toolbox
+    from toolbox.sbml.modelCache import unpackSciPyModel
+
+    Tasks = [(FilePath, CacheDirectory, StoichiometryFormat)
+             for FilePath in findSBMLFiles(Source)]
+
+    if Processes == 1 or len(Tasks) < 2:
+        Pool = None
+        Results = (importWorker(Task) for Task in Tasks)
+    else:
+        Pool = multiprocessing.Pool(Processes)
+        Results = Pool.imap_unordered(importWorker, Tasks)
+
+    try:
+        for FilePath, MetaData, Arrays, Error, Seconds in Results:
+            if Error != None:
+                yield FilePath, Exception(Error), Seconds
+                continue
+
+            # Rebuild the SciPyModel structure in the parent process
+            SciPyModel = toolbox.createSciPyModel()
+            SciPyModel.MetaData.FilePath = FilePath
+            SciPyModel.MetaData.CacheDirectory = CacheDirectory
+            SciPyModel.Reactions.StoichiometryFormat = StoichiometryFormat
+            SciPyModel = unpackSciPyModel(SciPyModel, MetaData, Arrays)
+            yield (FilePath,
+                   toolbox.simulation.createJacobianSparsity(SciPyModel),
+                   Seconds)
+    finally:
+        if Pool != None:
+            Pool.terminate()
+            Pool.join()
+
+
+def batchImportSBMLFiles( Source, Processes=None, CacheDirectory=None,
+                          Callback=None, StoichiometryFormat='dense' ):
+    '''
+        Import a directory or corpus of SBML model files in
+        parallel. Each file is processed by importSBMLFile in a
+        separate worker process.
+
+        Parameters
+        ----------
+        Source : str or list of str
+            Directory, glob pattern or file path(s).
+        Processes : int, optional
+            Number of worker processes. Defaults to the number
+            of CPUs.
+        CacheDirectory : str, optional
+            Model cache directory passed to importSBMLFile.
+        Callback : function, optional
+            Called as Callback(FilePath, Result, Seconds) as
+            soon as each file finishes.
+        StoichiometryFormat : str, optional
+            'dense', 'csr' or 'csc'. Format of the stoichiometry
+            matrix of every imported model. Defaults to 'dense'.
+
+        Returns
+        -------
+        Models : dict
+            Imported SciPyModel objects keyed by file path.
+        Summary : dict
+            'Imported' and 'Failed' counts, 'Errors' mapping
+            failed file paths to messages, 'Timings' mapping
+            every file path to its import time in seconds and
+            'TotalTime' for the whole batch.
+
+        See Also
+        --------
+        importSBMLFile, iterImportSBMLFiles
+
+        Notes
+        -----
+        Also available from the command line:
+
+        python -m toolbox.sbml.batchImportSBMLFiles PATH [PATH ...]
+    '''
+    import time
+
+    StartTime = time.time()
+    Models = {}
+    Summary = {'Imported': 0, 'Failed': 0, 'Errors': {}, 'Timings': {}}
+
+    for FilePath, Result, Seconds in iterImportSBMLFiles(
+            Source, Processes, CacheDirectory, StoichiometryFormat):
+        Summary['Timings'][FilePath] = Seconds
+        if isinstance(Result, Exception):
+            Summary['Failed'] += 1
+            Summary['Errors'][FilePath] = str(Result)
+        else:
+            Summary['Imported'] += 1
+            Models[FilePath] = Result
+        if Callback != None:
+            Callback(FilePath, Result, Seconds)
+
+    Summary['TotalTime'] = time.time() - StartTime
+
+    return Models, Summary
+
+
+def main( args ):
+    '''usage: batchImportSBMLFiles.py [-j PROCESSES] [-c CACHEDIR] [-s FORMAT] PATH [PATH ...]
+
+       PATH may be a directory, a glob pattern or an SBML file.
+    '''
+    import argparse
+
+    Parser = argparse.ArgumentParser(description=main.__doc__.split('\n')[0])
+    Parser.add_argument('Paths', metavar='PATH', nargs='+')
+    Parser.add_argument('-j', '--processes', type=int, default=None)
+    Parser.add_argument('-c', '--cache', default=None)
+    Parser.add_argument('-s', '--stoichiometry', default='dense',
+                        choices=['dense', 'csr', 'csc'])
+    Options = Parser.parse_args(args[1:])
+
+    def Report(FilePath, Result, Seconds):
+        if isinstance(Result, Exception):
+            print('FAILED %8.3fs  %s  (%s)' % (Seconds, FilePath, Result))
+        else:
+            print('OK     %8.3fs  %s' % (Seconds, FilePath))
+
+    Models, Summary = batchImportSBMLFiles(Options.Paths, Options.processes,
+                                           Options.cache, Report,
+                                           Options.stoichiometry)
+
+    print('%d imported, %d failed in %.3fs' %
+          (Summary['Imported'], Summary['Failed'], Summary['TotalTime']))
+
+    return 1 if Summary['Failed'] else 0
+
+
+if __name__ == '__main__':
+    import os, sys
+    PackageDirectory = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if PackageDirectory not in sys.path:
+        sys.path.append(PackageDirectory)
+    sys.exit(main(sys.argv))
@@ -43,18 +43,41 @@ def importSBMLFile( SciPyModel ):
         If no file path is provided or if the provided file
         encounters error, then the function returns an unmodified
         SciPyModel object.
+        
+        If SciPyModel.MetaData.CacheDirectory is set, the
+        vectorized model is stored there keyed by a hash of the
+        SBML file contents and later imports of the same file
+        skip libSBML entirely. SciPyModel.MetaData.CacheSizeLimit
+        bounds the directory size in bytes, evicting least
+        recently used entries first.
+        
+        Set SciPyModel.Reactions.StoichiometryFormat to 'csr' or
+        'csc' before importing to keep the stoichiometry matrix
+        as a scipy.sparse matrix instead of a dense array.
     '''
 
     # Import required modules
-    import libsbml, numpy, Tkinter, tkFileDialog
+    import libsbml, numpy, re, scipy.sparse
+    import toolbox
     
     # Conditional to check if FilePath was specified
     if SciPyModel.MetaData.FilePath == None:
-        Tkinter.Tk().withdraw()
-        SciPyModel.MetaData.FilePath = tkFileDialog.askopenfilename()
+        import tkinter, tkinter.filedialog
+        tkinter.Tk().withdraw()
+        SciPyModel.MetaData.FilePath = tkinter.filedialog.askopenfilename()
     else:
         pass
     
+    # Reuse the vectorized model from the cache if it was seen before.
+    # The cache key is the hash of the SBML file contents.
+    if SciPyModel.MetaData.CacheDirectory != None:
+        from toolbox.sbml.modelCache import (hashSBMLFile, readModelCache,
+                                             writeModelCache,
+                                             pruneCacheDirectory)
+        CacheKey = hashSBMLFile(SciPyModel.MetaData.FilePath)
+        if readModelCache(SciPyModel, CacheKey):
+            return toolbox.simulation.createJacobianSparsity(SciPyModel)
+    
     # Read in SBML model file into SBML Document variable
     SBMLDoc = libsbml.readSBMLFromFile(SciPyModel.MetaData.FilePath)
     
@@ -121,7 +144,7 @@ def importSBMLFile( SciPyModel ):
         SciPyModel.Species.MetaID.append(current_species.meta_id)
     
     # Extract Parameter Data
-    # -- Quantity, Names, Value, VectorIndex, MetaID, KineticFlag
+    # -- Quantity, Names, Value, VectorIndex, MetaID, KineticFlag, FixedFlag
     SciPyModel.Parameters.Quantity = SBMLModel.getNumParameters()
     for i in range(SBMLModel.getNumParameters()):
         current_parameter = SBMLModel.getParameter(i)
@@ -133,87 +156,101 @@ def importSBMLFile( SciPyModel ):
     SciPyModel.Parameters.KineticFlag.append(False)
     for i in range(SciPyModel.Parameters.Quantity)
     ]
+    [
+    SciPyModel.Parameters.FixedFlag.append(False)
+    for i in range(SciPyModel.Parameters.Quantity)
+    ]
+    
+    # Build lookup tables from every identifier a reaction may use to
+    # reference a species or parameter. Assignments made later take
+    # priority. SBML ids are what kinetic laws and species references
+    # use, so they are assigned last and always win, while MetaIDs and
+    # Names only serve as a fallback for identifiers which are no id.
+    SpeciesIndex = {}
+    SymbolMap = {}
+    for Prefix, IdList in [
+        ('y', SciPyModel.Species.MetaID),
+        ('p', SciPyModel.Parameters.MetaID),
+        ('y', SciPyModel.Species.Names),
+        ('p', SciPyModel.Parameters.Names),
+        ('y', [SBMLModel.getSpecies(i).getId()
+               for i in range(SciPyModel.Species.Quantity)]),
+        ('p', [SBMLModel.getParameter(i).getId()
+               for i in range(SciPyModel.Parameters.Quantity)])]:
+        # Iterate backwards so the first occurrence of a duplicate wins
+        for ix in reversed(range(len(IdList))):
+            if IdList[ix] != '':
+                SymbolMap[IdList[ix]] = Prefix + '[' + str(ix) + ']'
+                if Prefix == 'y':
+                    SpeciesIndex[IdList[ix]] = ix
+    
+    # Compartment identifiers which are removed from reaction equations.
+    CompartmentKeys = set()
+    for j in range(SciPyModel.Compartments.Quantity):
+        CompartmentKeys.add(SciPyModel.Compartments.Names[j])
+        CompartmentKeys.add(SBMLModel.getCompartment(j).getId())
+    CompartmentKeys.discard('')
+    
+    # Single tokenizing pattern. Compartment factors are matched together
+    # with their operator so they can be dropped, every other identifier
+    # is matched whole so 'k1' never matches inside 'k10'.
+    TokenPattern = r'(?<![\w.])([A-Za-z_]\w*)'
+    if CompartmentKeys:
+        CompartmentPattern = '|'.join(
+            re.escape(key)
+            for key in sorted(CompartmentKeys, key=len, reverse=True))
+        TokenPattern = (r'(?<![\w.])(?:' + CompartmentPattern + r')\s*\*\s*'
+                        + r'|\s*[*/]\s*(?:' + CompartmentPattern
+                        + r')(?![\w.])|' + TokenPattern)
+    TokenPattern = re.compile(TokenPattern)
+    
+    def SubstituteToken(Match):
+        if Match.group(1) is None:
+            return ''
+        return SymbolMap.get(Match.group(1), Match.group(1))
     
     # Extract Reaction Data
     # -- Names, Formulas, Stoichiometry
-    SciPyModel.Reactions.Stoichiometry = numpy.zeros(
-        [SBMLModel.getNumSpecies(),
-         SBMLModel.getNumReactions()])
+    # Stoichiometry is gathered as (species, reaction, value) triplets
+    # so only nonzero entries are ever stored.
+    StoichiometryRows = []
+    StoichiometryColumns = []
+    StoichiometryValues = []
     SciPyModel.Reactions.Quantity = SBMLModel.getNumReactions()
     for i in range(SBMLModel.getNumReactions()):
         current_reaction = SBMLModel.getReaction(i)
         SciPyModel.Reactions.Names.append(current_reaction.name)
+        
+        # Vectorize the formula in a single pass over its tokens
         SciPyModel.Reactions.Formulas.append(
-            current_reaction.getKineticLaw().getFormula())
+            TokenPattern.sub(SubstituteToken,
+                             current_reaction.getKineticLaw().getFormula()))
 
-        # Try-Except in order to see if Names or MetaID are used in the functions
+        # Species references may use Names, MetaID or SBML ids
         try:
             for r in current_reaction.getListOfReactants():
-                SciPyModel.Reactions.Stoichiometry[SciPyModel.Species.Names.index(
-                    r.getSpecies()), i] -= r.getStoichiometry()
-            for p in current_reaction.getListOfProducts():
-                SciPyModel.Reactions.Stoichiometry[SciPyModel.Species.Names.index(
-                    p.getSpecies()), i] += p.getStoichiometry()
-        except ValueError:
-            for r in current_reaction.getListOfReactants():
-                SciPyModel.Reactions.Stoichiometry[SciPyModel.Species.MetaID.index(
-                    r.getSpecies()), i] -= r.getStoichiometry()
+                StoichiometryRows.append(SpeciesIndex[r.getSpecies()])
+                StoichiometryColumns.append(i)
+                StoichiometryValues.append(-r.getStoichiometry())
             for p in current_reaction.getListOfProducts():
-                SciPyModel.Reactions.Stoichiometry[SciPyModel.Species.MetaID.index(
-                    p.getSpecies()), i] += p.getStoichiometry()
-        else:
-            print 'ERROR: Unable to create Stoichiometric Matrix. Check species name/metaid.'
+                StoichiometryRows.append(SpeciesIndex[p.getSpecies()])
+                StoichiometryColumns.append(i)
+                StoichiometryValues.append(p.getStoichiometry())
+        except KeyError:
+            print('ERROR: Unable to create Stoichiometric Matrix. Check species name/metaid.')
 
-        # Remove Stoichiometry of Boundary State Variables
-        for s in range(SciPyModel.Species.Quantity):
-            if SciPyModel.Species.BoundaryValue[s]:
-                SciPyModel.Reactions.Stoichiometry[s, :] = numpy.zeros(
-                    (1, SciPyModel.Reactions.Quantity))
+    # Remove Stoichiometry of Boundary State Variables
+    StoichiometryRows = numpy.array(StoichiometryRows, dtype=int)
+    KeepEntry = numpy.invert(numpy.array(
+        SciPyModel.Species.BoundaryValue, dtype=bool)[StoichiometryRows])
 
-    # Vectorize Functions within SciPyModel object.
-    for rxn_ix in range(SciPyModel.Reactions.Quantity):
-
-        # Get information about the current reaction
-        Formula = SciPyModel.Reactions.Formulas[rxn_ix]
-
-        # Removes usage of compartments from reaction equations.
-        for j in reversed(range(SciPyModel.Compartments.Quantity)):
-            if SciPyModel.Compartments.Names[j] != '':  # If name isn't empty
-                Formula = Formula.replace(SciPyModel.Compartments.Names[j] + ' * ',
-                                          '')
-                Formula = Formula.replace(' * ' + SciPyModel.Compartments.Names[j],
-                                          '')
-                Formula = Formula.replace(' / ' + SciPyModel.Compartments.Names[j],
-                                          '')
-
-        # Replace parameter names with index of vectorized parameter array.
-        # Iterates through parameter names sorted by length of name.
-        for key in sorted(
-                SciPyModel.Parameters.Names, key=len, reverse=True):
-            if key != '':
-                Formula = Formula.replace(key, 'p[' + str(
-                    SciPyModel.Parameters.Names.index(key)) + ']')
-
-        for key in sorted(
-                SciPyModel.Parameters.MetaID, key=len, reverse=True):
-            if key != '':
-                Formula = Formula.replace(key, 'p[' + str(
-                    SciPyModel.Parameters.MetaID.index(key)) + ']')
-
-        # Replace species names with index of species parameter array.
-        for key in sorted(SciPyModel.Species.Names, key=len, reverse=True):
-            if key != '':
-                Formula = Formula.replace(
-                    key, 'y[' + str(SciPyModel.Species.Names.index(key)) + ']')
+    # Duplicate entries are summed, giving net stoichiometry per species
+    SciPyModel.Reactions.Stoichiometry = scipy.sparse.csc_matrix(
+        (numpy.array(StoichiometryValues, dtype=float)[KeepEntry],
+         (StoichiometryRows[KeepEntry],
+          numpy.array(StoichiometryColumns, dtype=int)[KeepEntry])),
+        shape=(SBMLModel.getNumSpecies(), SBMLModel.getNumReactions()))
 
-        for key in sorted(SciPyModel.Species.MetaID, key=len, reverse=True):
-            if key != '':
-                Formula = Formula.replace(
-                    key, 'y[' + str(SciPyModel.Species.MetaID.index(key)) + ']')
-
-        # Reset formula declaration in SciPyModel class
-        SciPyModel.Reactions.Formulas[rxn_ix] = Formula
-    
     # Grab indecies of kinetic rate constant parameters
     ReactionIndex = []
     for rxn_ix in range(SciPyModel.Reactions.Quantity):
@@ -232,8 +269,26 @@ def importSBMLFile( SciPyModel ):
     ]
 
     # Apply the index ordering to order the stoichiometry matrix
-    SciPyModel.Reactions.Stoichiometry = numpy.vstack([
-        SciPyModel.Reactions.Stoichiometry[:, i] for i in SortedIndex
-    ]).transpose()
+    SciPyModel.Reactions.Stoichiometry = (
+        SciPyModel.Reactions.Stoichiometry[:, SortedIndex])
+    
+    # Convert the stoichiometry matrix into the requested format
+    if SciPyModel.Reactions.StoichiometryFormat in ['csr', 'csc']:
+        SciPyModel.Reactions.Stoichiometry = (
+            SciPyModel.Reactions.Stoichiometry.asformat(
+                SciPyModel.Reactions.StoichiometryFormat))
+    else:
+        SciPyModel.Reactions.Stoichiometry = (
+            SciPyModel.Reactions.Stoichiometry.toarray())
+    
+    # Record which species each reaction rate and derivative depends on
+    SciPyModel = toolbox.simulation.createJacobianSparsity(SciPyModel)
+    
+    # Store the vectorized model and evict old entries if over the limit
+    if SciPyModel.MetaData.CacheDirectory != None:
+        writeModelCache(SciPyModel, CacheKey)
+        if SciPyModel.MetaData.CacheSizeLimit != None:
+            pruneCacheDirectory(SciPyModel.MetaData.CacheDirectory,
+                                SciPyModel.MetaData.CacheSizeLimit)
     
     return SciPyModel
\ No newline at end of file
@@ -0,0 +1,265 @@
+'''
+    Content-addressed on-disk cache for vectorized SciPyModel
+    objects. Each entry is stored as a pair of files named by
+    the SHA-1 hash of the SBML model file contents:
+
+        <key>.npz  -- names, values, formulas and stoichiometry
+        <key>.json -- model metadata and quantities
+
+    Entries are evicted in least-recently-used order whenever
+    the directory grows beyond the requested size limit.
+'''
+
+# Bump whenever importSBMLFile changes how models are vectorized so
+# stale entries are never reused.
+CACHE_VERSION = '3'
+
+# Contents every entry must hold before it is unpacked.
+CACHE_METADATA = frozenset([
+    'Version', 'FilePath', 'Name', 'VolumeUnits', 'SubstanceUnits',
+    'TimeUnits'])
+CACHE_ARRAYS = frozenset([
+    'CompartmentNames', 'CompartmentMetaID', 'SpeciesNames', 'SpeciesValue',
+    'SpeciesBoundaryValue', 'SpeciesMetaID', 'ParameterNames',
+    'ParameterValue', 'ParameterMetaID', 'ParameterKineticFlag',
+    'ReactionNames', 'ReactionFormulas', 'StoichiometryRow',
+    'StoichiometryColumn', 'StoichiometryValue'])
+
+
+def hashSBMLFile( FilePath ):
+    '''
+        Return the cache key of an SBML model file, computed
+        from the file contents and the cache format version.
+    '''
+    import hashlib
+
+    Hash = hashlib.sha1(('SciPyModel-' + CACHE_VERSION + '\n').encode())
+    with open(FilePath, 'rb') as FileObject:
+        for Block in iter(lambda: FileObject.read(1 << 20), b''):
+            Hash.update(Block)
+
+    return Hash.hexdigest()
+
+
+def packSciPyModel( SciPyModel ):
+    '''
+        Convert the imported contents of SciPyModel into plain
+        data which can be pickled or written to disk. Returns
+        a dictionary of metadata and a dictionary of arrays.
+    '''
+    import numpy, scipy.sparse
+
+    # Unicode arrays keep the entry loadable without pickle support
+    def TextArray(Values):
+        return numpy.array([u'%s' % Value for Value in Values], dtype='U')
+
+    MetaData = {
+        'Version': CACHE_VERSION,
+        'FilePath': SciPyModel.MetaData.FilePath,
+        'Name': SciPyModel.MetaData.Name,
+        'VolumeUnits': SciPyModel.MetaData.VolumeUnits,
+        'SubstanceUnits': SciPyModel.MetaData.SubstanceUnits,
+        'TimeUnits': SciPyModel.MetaData.TimeUnits
+    }
+
+    Arrays = {
+        'CompartmentNames': TextArray(SciPyModel.Compartments.Names),
+        'CompartmentMetaID': TextArray(SciPyModel.Compartments.MetaID),
+        'SpeciesNames': TextArray(SciPyModel.Species.Names),
+        'SpeciesValue': numpy.array(SciPyModel.Species.Value, dtype=float),
+        'SpeciesBoundaryValue': numpy.array(
+            SciPyModel.Species.BoundaryValue, dtype=bool),
+        'SpeciesMetaID': TextArray(SciPyModel.Species.MetaID),
+        'ParameterNames': TextArray(SciPyModel.Parameters.Names),
+        'ParameterValue': numpy.array(SciPyModel.Parameters.Value, dtype=float),
+        'ParameterMetaID': TextArray(SciPyModel.Parameters.MetaID),
+        'ParameterKineticFlag': numpy.array(
+            SciPyModel.Parameters.KineticFlag, dtype=bool),
+        'ReactionNames': TextArray(SciPyModel.Reactions.Names),
+        'ReactionFormulas': TextArray(SciPyModel.Reactions.Formulas)
+    }
+
+    # Stoichiometry is stored as coordinate triplets in either format
+    Stoichiometry = scipy.sparse.coo_matrix(SciPyModel.Reactions.Stoichiometry)
+    Arrays['StoichiometryRow'] = Stoichiometry.row
+    Arrays['StoichiometryColumn'] = Stoichiometry.col
+    Arrays['StoichiometryValue'] = Stoichiometry.data.astype(float)
+
+    return MetaData, Arrays
+
+
+def unpackSciPyModel( SciPyModel, MetaData, Arrays ):
+    '''
+        Fill the provided SciPyModel from the plain data
+        produced by packSciPyModel. The stoichiometry matrix is
+        rebuilt in SciPyModel.Reactions.StoichiometryFormat.
+    '''
+    import scipy.sparse
+
+    # Extract MetaData
+    SciPyModel.MetaData.Name = MetaData['Name']
+    SciPyModel.MetaData.VolumeUnits = MetaData['VolumeUnits']
+    SciPyModel.MetaData.SubstanceUnits = MetaData['SubstanceUnits']
+    SciPyModel.MetaData.TimeUnits = MetaData['TimeUnits']
+    if SciPyModel.MetaData.FilePath == None:
+        SciPyModel.MetaData.FilePath = MetaData['FilePath']
+
+    # Extract Compartment Data
+    SciPyModel.Compartments.Names = Arrays['CompartmentNames'].tolist()
+    SciPyModel.Compartments.MetaID = Arrays['CompartmentMetaID'].tolist()
+    SciPyModel.Compartments.Quantity = len(SciPyModel.Compartments.Names)
+    SciPyModel.Compartments.VectorIndex = list(
+        range(SciPyModel.Compartments.Quantity))
+
+    # Extract Species Data
+    SciPyModel.Species.Names = Arrays['SpeciesNames'].tolist()
+    SciPyModel.Species.Value = Arrays['SpeciesValue'].tolist()
+    SciPyModel.Species.BoundaryValue = Arrays['SpeciesBoundaryValue'].tolist()
+    SciPyModel.Species.MetaID = Arrays['SpeciesMetaID'].tolist()
+    SciPyModel.Species.Quantity = len(SciPyModel.Species.Names)
+    SciPyModel.Species.VectorIndex = list(range(SciPyModel.Species.Quantity))
+
+    # Extract Parameter Data
+    SciPyModel.Parameters.Names = Arrays['ParameterNames'].tolist()
+    SciPyModel.Parameters.Value = Arrays['ParameterValue'].tolist()
+    SciPyModel.Parameters.MetaID = Arrays['ParameterMetaID'].tolist()
+    SciPyModel.Parameters.KineticFlag = Arrays['ParameterKineticFlag'].tolist()
+    SciPyModel.Parameters.Quantity = len(SciPyModel.Parameters.Names)
+    SciPyModel.Parameters.FixedFlag = [False] * SciPyModel.Parameters.Quantity
+    SciPyModel.Parameters.VectorIndex = list(
+        range(SciPyModel.Parameters.Quantity))
+
+    # Extract Reaction Data
+    SciPyModel.Reactions.Names = Arrays['ReactionNames'].tolist()
+    SciPyModel.Reactions.Formulas = Arrays['ReactionFormulas'].tolist()
+    SciPyModel.Reactions.Quantity = len(SciPyModel.Reactions.Names)
+    SciPyModel.Reactions.Stoichiometry = scipy.sparse.coo_matrix(
+        (Arrays['StoichiometryValue'],
+         (Arrays['StoichiometryRow'], Arrays['StoichiometryColumn'])),
+        shape=(SciPyModel.Species.Quantity, SciPyModel.Reactions.Quantity))
+    if SciPyModel.Reactions.StoichiometryFormat in ['csr', 'csc']:
+        SciPyModel.Reactions.Stoichiometry = (
+            SciPyModel.Reactions.Stoichiometry.asformat(
+                SciPyModel.Reactions.StoichiometryFormat))
+    else:
+        SciPyModel.Reactions.Stoichiometry = (
+            SciPyModel.Reactions.Stoichiometry.toarray())
+
+    return SciPyModel
+
+
+def readModelCache( SciPyModel, Key ):
+    '''
+        Fill the provided SciPyModel from the cache entry
+        named Key within SciPyModel.MetaData.CacheDirectory.
+        Returns True on a cache hit and False otherwise. Entries
+        which are unreadable or incomplete count as a miss and
+        leave SciPyModel untouched.
+    '''
+    import os, json, zipfile, numpy
+
+    BasePath = os.path.join(SciPyModel.MetaData.CacheDirectory, Key)
+
+    # Check that both halves of the entry exist and are readable
+    try:
+        with open(BasePath + '.json', 'r') as FileObject:
+            MetaData = json.load(FileObject)
+        NpzFile = numpy.load(BasePath + '.npz', allow_pickle=False)
+        Arrays = dict((Name, NpzFile[Name]) for Name in NpzFile.files)
+        NpzFile.close()
+    except (IOError, OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return False
+
+    # Check the entry is complete before anything is unpacked
+    if not isinstance(MetaData, dict) or MetaData.get(
+            'Version') != CACHE_VERSION:
+        return False
+    if not (CACHE_METADATA.issubset(MetaData) and
+            CACHE_ARRAYS.issubset(Arrays)):
+        return False
+
+    # Refresh access time for least-recently-used eviction
+    try:
+        os.utime(BasePath + '.npz', None)
+    except OSError:
+        pass
+
+    unpackSciPyModel(SciPyModel, MetaData, Arrays)
+
+    return True
+
+
+def writeModelCache( SciPyModel, Key ):
+    '''
+        Store the vectorized contents of SciPyModel under the
+        cache entry named Key. Files are written to temporary
+        names first and renamed into place, so concurrent
+        importers never observe a partially written entry.
+    '''
+    import os, json, numpy, tempfile
+
+    Directory = SciPyModel.MetaData.CacheDirectory
+    if not os.path.isdir(Directory):
+        try:
+            os.makedirs(Directory)
+        except OSError:
+            if not os.path.isdir(Directory):
+                raise
+
+    BasePath = os.path.join(Directory, Key)
+    MetaData, Arrays = packSciPyModel(SciPyModel)
+
+    # Write array data
+    Handle, TempPath = tempfile.mkstemp(dir=Directory, suffix='.npz.tmp')
+    with os.fdopen(Handle, 'wb') as FileObject:
+        numpy.savez(FileObject, **Arrays)
+    os.rename(TempPath, BasePath + '.npz')
+
+    # Write metadata last, its presence marks the entry as complete
+    Handle, TempPath = tempfile.mkstemp(dir=Directory, suffix='.json.tmp')
+    with os.fdopen(Handle, 'w') as FileObject:
+        json.dump(MetaData, FileObject)
+    os.rename(TempPath, BasePath + '.json')
+
+    return BasePath
+
+
+def pruneCacheDirectory( Directory, SizeLimit ):
+    '''
+        Delete least-recently-used cache entries until the
+        total size of Directory is at most SizeLimit bytes.
+        Files sharing a key are treated as one entry.
+    '''
+    import os
+
+    # Group cache files by key and track last access of each entry
+    Entries = {}
+    for FileName in os.listdir(Directory):
+        FilePath = os.path.join(Directory, FileName)
+        if FileName.endswith('.tmp') or not os.path.isfile(FilePath):
+            continue
+        try:
+            Status = os.stat(FilePath)
+        except OSError:
+            continue
+        Key = FileName.split('.')[0]
+        Entry = Entries.setdefault(Key, [0, 0., []])
+        Entry[0] += Status.st_size
+        Entry[1] = max(Entry[1], Status.st_mtime)
+        Entry[2].append(FilePath)
+
+    TotalSize = sum(Entry[0] for Entry in Entries.values())
+
+    # Remove oldest entries first
+    for Size, LastUsed, FilePaths in sorted(
+            Entries.values(), key=lambda Entry: Entry[1]):
+        if TotalSize <= SizeLimit:
+            break
+        for FilePath in FilePaths:
+            try:
+                os.remove(FilePath)
+            except OSError:
+                pass
+        TotalSize -= Size
+
+    return TotalSize
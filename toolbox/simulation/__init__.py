@@ -1,3 +1,11 @@
-from calculateLocalSensitivities import calculateLocalSensitivities
-from integrateODEFunction import integrateODEFunction
-from writeODEFunction import writeODEFunction
\ No newline at end of file
+from .calculateAdjointGradient import calculateAdjointGradient
+from .calculateElementaryEffects import calculateElementaryEffects
+from .calculateGlobalSensitivities import calculateGlobalSensitivities
+from .calculateLocalSensitivities import calculateLocalSensitivities
+from .compileODEFunction import compileODEFunction
+from .createDataArray import createDataArray
+from .createJacobianSparsity import createJacobianSparsity
+from .integrateEnsemble import integrateEnsemble
+from .integrateODEFunction import integrateODEFunction
+from .writeJacobianFunction import writeJacobianFunction
+from .writeODEFunction import writeODEFunction
\ No newline at end of file
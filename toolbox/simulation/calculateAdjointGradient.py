@@ -0,0 +1,162 @@
+def calculateAdjointGradient( SciPyModel ):
+    '''
+        Calculate the gradient of a scalar objective comparing
+        the simulation to observed data with respect to all
+        parameters by way of the continuous adjoint method.
+        One forward integration stores the state trajectory,
+        and one backward integration of the adjoint equations
+        yields the whole gradient, so its cost does not grow
+        with the number of parameters.
+
+        To Do
+        -----
+        1. Allow observation times other than the simulation
+           time vector.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            SciPyModel object with time data specified and the
+            (time points x species) observed data placed into
+            SimulationData.Sensitivity.Adjoint.Data. NaN
+            entries are treated as unobserved. Adjoint.Objective
+            may be 'TwoNorm' (default), the Euclidean norm of
+            the residuals, or 'SumOfSquares', its square. The
+            TwoNorm gradient is returned as zero at a perfect fit.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel object with the objective value placed in
+            Adjoint.Cost and the gradient with respect to
+            Parameters.Value in Adjoint.Gradient.
+
+        See Also
+        --------
+        calculateLocalSensitivities, writeJacobianFunction
+
+        Notes
+        -----
+        For the sum of squares G = sum_k g_k(y(t_k)) the
+        adjoint state solves
+
+            dl/dt = -J^T l,    l(t_K) = 0
+
+        backwards in time, jumping by dg_k/dy at each
+        observation time t_k, and the gradient is
+
+            dG/dp = integral of l^T df/dp dt
+
+        which is accumulated as an extra quadrature state of
+        the backward integration. J and df/dp are the analytic
+        functions generated by writeJacobianFunction. The
+        forward states needed by the backward pass are taken
+        from the continuous solution of the forward solve, so
+        odeint is replaced by the LSODA method of solve_ivp.
+    '''
+    # Import required packages
+    import numpy, scipy.sparse
+    from scipy.integrate import solve_ivp
+    import toolbox
+    from toolbox.simulation.solveODESystem import (getIntegratorOptions,
+                                                   solveODESystem)
+
+    # Generate the analytic Jacobians if they are missing
+    SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+    if not hasattr(SciPyModel.ToolboxFunctions.DerivativeModule, 'pjac_fun'):
+        SciPyModel = toolbox.simulation.writeJacobianFunction(SciPyModel)
+        SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+    DerivativeModule = SciPyModel.ToolboxFunctions.DerivativeModule
+
+    # Check if time vector data is specified
+    try:
+        TimeVector = numpy.linspace(SciPyModel.SimulationData.TimeStart,
+                                    SciPyModel.SimulationData.TimeEnd,
+                                    SciPyModel.SimulationData.DataPoints)
+    except TypeError:
+        print('ERROR: Check time data values in SciPyModel object.')
+        return
+
+    Adjoint = SciPyModel.SimulationData.Sensitivity.Adjoint
+    if Adjoint.Objective == None:
+        Adjoint.Objective = 'TwoNorm'
+    if Adjoint.Objective not in ['TwoNorm', 'SumOfSquares']:
+        print('ERROR: Unknown adjoint Objective ' + repr(Adjoint.Objective) +
+              ', expected TwoNorm or SumOfSquares.')
+        return
+    ObservedData = numpy.asarray(Adjoint.Data, dtype=float)
+    Parameters = numpy.array(SciPyModel.Parameters.Value, dtype=float)
+    NumSpecies = SciPyModel.Species.Quantity
+
+    # Forward solve keeping the continuous solution as checkpoints
+    Options = getIntegratorOptions(SciPyModel)
+    Options['DenseOutput'] = True
+    if Options['Method'] == None or Options['Method'] == 'odeint':
+        Options['Method'] = 'LSODA'
+    Data, Interpolant, Method = solveODESystem(
+        DerivativeModule, SciPyModel.Species.Value, TimeVector, Parameters,
+        Options)
+    SciPyModel.SimulationData.Deterministic.Data = Data
+    SciPyModel.SimulationData.Deterministic.TimeVector = TimeVector
+    SciPyModel.SimulationData.Deterministic.Method = Method
+
+    # Residuals and objective, ignoring unobserved entries
+    Residual = numpy.where(numpy.isnan(ObservedData), 0., Data - ObservedData)
+    SumOfSquares = numpy.sum(Residual**2)
+
+    def AdjointFunction(t, z):
+        y = Interpolant(t)
+        return numpy.concatenate([
+            -DerivativeModule.jac_fun(y, t, Parameters).T.dot(z[:NumSpecies]),
+            -DerivativeModule.pjac_fun(y, t, Parameters).T.dot(z[:NumSpecies])])
+
+    def AdjointJacobian(t, z):
+        y = Interpolant(t)
+        Block = scipy.sparse.vstack([
+            -scipy.sparse.csr_matrix(DerivativeModule.jac_fun(y, t, Parameters)).T,
+            -scipy.sparse.csr_matrix(DerivativeModule.pjac_fun(y, t, Parameters)).T])
+        Block = scipy.sparse.hstack(
+            [Block, scipy.sparse.csr_matrix((Block.shape[0], len(Parameters)))],
+            format='csc')
+        if Method == 'LSODA':
+            return Block.toarray()
+        return Block
+
+    Settings = {'method': Method}
+    if Options['RelativeTolerance'] != None:
+        Settings['rtol'] = Options['RelativeTolerance']
+    if Options['AbsoluteTolerance'] != None:
+        Settings['atol'] = Options['AbsoluteTolerance']
+    if Options['MaximumStep'] != None:
+        Settings['max_step'] = Options['MaximumStep']
+    if Method in ['BDF', 'Radau', 'LSODA']:
+        Settings['jac'] = AdjointJacobian
+
+    # Backward solve of the adjoint state and the gradient quadrature,
+    # jumping at each observation time
+    z = numpy.zeros(NumSpecies + len(Parameters))
+    for t_ix in range(len(TimeVector) - 1, 0, -1):
+        z[:NumSpecies] += 2 * Residual[t_ix]
+        Solution = solve_ivp(AdjointFunction,
+                             (TimeVector[t_ix], TimeVector[t_ix - 1]), z,
+                             **Settings)
+        if not Solution.success:
+            print('ERROR: ' + Solution.message)
+            z[:] = numpy.nan
+            break
+        z = Solution.y[:, -1]
+    Gradient = z[NumSpecies:]
+
+    # Apply the chain rule for the Euclidean norm, which is not
+    # differentiable at a perfect fit where the gradient is taken as zero
+    if Adjoint.Objective == 'TwoNorm':
+        Adjoint.Cost = numpy.sqrt(SumOfSquares)
+        if Adjoint.Cost == 0:
+            Adjoint.Gradient = numpy.zeros_like(Gradient)
+        else:
+            Adjoint.Gradient = Gradient / (2 * Adjoint.Cost)
+    else:
+        Adjoint.Cost = SumOfSquares
+        Adjoint.Gradient = Gradient
+
+    return SciPyModel
@@ -0,0 +1,154 @@
+def calculateElementaryEffects( SciPyModel, Processes=None, Vectorized=False,
+                                Threshold=None ):
+    '''
+        Screen the model parameters by the method of Morris.
+        The model is integrated along the trajectories created
+        by morrisTrajectorySample and the elementary effect
+
+            EE_i = (f(x + Delta e_i) - f(x)) / Delta
+
+        of every step is collected for each species at each time
+        point, with x scaled to the unit hypercube. The mean
+        absolute effect mu* ranks the overall influence of a
+        parameter and the standard deviation sigma indicates
+        nonlinearity or interactions.
+
+        To Do
+        -----
+        1. Allow scalar model outputs other than the species
+           trajectories.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that writeODEFunction was called, the time
+            data in SimulationData is specified and that
+            morrisTrajectorySample filled Global.ParameterSets.
+        Processes : int, optional
+            Number of worker processes, see integrateEnsemble.
+        Vectorized : bool, optional
+            Integrate each chunk as a stacked system, see
+            integrateEnsemble.
+        Threshold : float, optional
+            If given, every parameter whose mu* stays below
+            Threshold times the largest mu* of any parameter for
+            all species and time points is marked in
+            Parameters.FixedFlag.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with the (parameters x time points x
+            species) statistics placed into Global.Mu,
+            Global.MuStar and Global.Sigma. Parameters which were
+            already fixed are NaN.
+
+        See Also
+        --------
+        morrisTrajectorySample, calculateGlobalSensitivities,
+        integrateEnsemble
+
+        Notes
+        -----
+        Screening costs NumSamples x (k + 1) integrations for k
+        free parameters, against NumSamples x (k + 2) base
+        samples for Sobol indices, where NumSamples is typically
+        10 to 50 trajectories here rather than thousands.
+        Parameters marked in FixedFlag are held at their Value
+        by the samplers and skipped by calculateLocalSensitivities
+        and calculateGlobalSensitivities.
+
+        The moved parameter and step of every trajectory step
+        are taken from Global.MovedParameter and Global.UnitStep.
+        If these do not match ParameterSets they are recovered
+        from the points, where steps of parameters with equal
+        MinimumValue and MaximumValue can not be identified and
+        are left out.
+    '''
+    # Import required packages
+    import numpy
+    import toolbox
+
+    SciPyModel = toolbox.simulation.integrateEnsemble(
+        SciPyModel, Processes, Vectorized=Vectorized)
+    if SciPyModel == None:
+        return
+
+    Global = SciPyModel.SimulationData.Sensitivity.Global
+    NumParameters = SciPyModel.Parameters.Quantity
+    FixedFlag = numpy.array(
+        SciPyModel.Parameters.FixedFlag or [False] * NumParameters, dtype=bool)
+    Free = numpy.flatnonzero(numpy.invert(FixedFlag))
+    NumFree = len(Free)
+    if NumFree == 0 or Global.ParameterSets.shape[0] % (NumFree + 1) != 0:
+        print('ERROR: ParameterSets do not match the trajectories of '
+              'morrisTrajectorySample.')
+        return
+    NumTrajectories = Global.ParameterSets.shape[0] // (NumFree + 1)
+
+    # Find the parameter moved in every step and its signed unit step,
+    # as recorded by morrisTrajectorySample if it matches the points
+    Points = numpy.real(Global.ParameterSets).reshape(
+        NumTrajectories, NumFree + 1, NumParameters)
+    Difference = numpy.diff(Points, axis=1)
+    Width = (numpy.asarray(SciPyModel.Parameters.MaximumValue, dtype=float) -
+             numpy.asarray(SciPyModel.Parameters.MinimumValue, dtype=float))
+    Recorded = (Global.MovedParameter is not None and
+                numpy.shape(Global.MovedParameter) == (NumTrajectories,
+                                                       NumFree))
+    if Recorded:
+        Column = numpy.asarray(Global.MovedParameter, dtype=int)
+        Unmoved = numpy.ones(Difference.shape, dtype=bool)
+        numpy.put_along_axis(Unmoved, Column[:, :, None], False, axis=2)
+        Recorded = not numpy.any(Difference[Unmoved])
+    if Recorded:
+        Step = numpy.asarray(Global.UnitStep, dtype=float)
+    else:
+        # Only free parameters of nonzero width can be seen moving
+        Movable = numpy.invert(FixedFlag) & (Width != 0)
+        Column = numpy.argmax(numpy.where(Movable, numpy.abs(Difference), -1.),
+                              axis=2)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            Step = numpy.take_along_axis(
+                Difference, Column[:, :, None], axis=2)[:, :, 0] / Width[Column]
+        Step[Step == 0] = numpy.nan
+
+    # Accumulate the elementary effects one trajectory at a time, so
+    # only a trajectory of Global.Data is held in memory
+    Shape = (NumParameters, ) + Global.Data.shape[1:]
+    Count = numpy.zeros(Shape)
+    Sum = numpy.zeros(Shape)
+    SumAbsolute = numpy.zeros(Shape)
+    SumSquare = numpy.zeros(Shape)
+    for r_ix in range(NumTrajectories):
+        Outputs = numpy.real(Global.Data[r_ix * (NumFree + 1):(r_ix + 1) *
+                                         (NumFree + 1)])
+        Effects = numpy.diff(Outputs, axis=0) / Step[r_ix, :, None, None]
+        Valid = numpy.isfinite(Effects)
+        Effects = numpy.where(Valid, Effects, 0.)
+        numpy.add.at(Count, Column[r_ix], Valid)
+        numpy.add.at(Sum, Column[r_ix], Effects)
+        numpy.add.at(SumAbsolute, Column[r_ix], numpy.abs(Effects))
+        numpy.add.at(SumSquare, Column[r_ix], Effects**2)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        Global.Mu = Sum / Count
+        Global.MuStar = SumAbsolute / Count
+        Global.Sigma = numpy.sqrt(numpy.maximum(
+            SumSquare - Count * Global.Mu**2, 0.) / (Count - 1))
+    Global.Mu[FixedFlag] = numpy.nan
+    Global.MuStar[FixedFlag] = numpy.nan
+    Global.Sigma[FixedFlag] = numpy.nan
+    Global.Sigma[Count < 2] = numpy.nan
+
+    # Fix parameters with negligible influence on every output
+    if Threshold != None:
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            Ratio = Global.MuStar[Free] / numpy.nanmax(Global.MuStar[Free],
+                                                       axis=0)
+        Ratio[numpy.isnan(Ratio)] = 0.
+        FixedFlag[Free[Ratio.reshape(NumFree, -1).max(axis=1) < Threshold]] = (
+            True)
+        SciPyModel.Parameters.FixedFlag = FixedFlag.tolist()
+
+    return SciPyModel
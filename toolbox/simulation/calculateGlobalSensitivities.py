@@ -0,0 +1,307 @@
+def calculateGlobalSensitivities( SciPyModel, Sampler=None, Processes=None,
+                                  Vectorized=False, BlockSize=None,
+                                  NumResamples=100, Callback=None,
+                                  Cancel=None, Seed=None ):
+    '''
+        Calculate first-order and total-order Sobol indices of
+        every species at every time point with respect to the
+        model parameters. Two independent base samples A and B
+        of NumSamples parameter sets are drawn with one of the
+        toolbox samplers, and the model is evaluated at A, B
+        and the P matrices AB_i, i.e. A with column i taken
+        from B. The indices are estimated as
+
+            V   = Var[f(A), f(B)]
+            S_i = mean( f(B) (f(AB_i) - f(A)) ) / V
+            T_i = mean( (f(A) - f(AB_i))^2 ) / (2 V)
+
+        following Saltelli et al. (2010) for S_i and Jansen
+        (1999) for T_i.
+
+        To Do
+        -----
+        1. Allow scalar model outputs other than the species
+           trajectories.
+        2. Second-order indices.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that writeODEFunction was called, the time
+            data in SimulationData is specified, and that
+            Global.NumSamples and the parameter bounds needed by
+            the sampler are set.
+        Sampler : function, optional
+            Toolbox sampler filling Global.ParameterSets, e.g.
+            toolbox.sampling.uniformNullSpaceSample or the
+            scrambled toolbox.sampling.quasiRandomSample, which
+            converges with fewer samples. A sampler may also
+            return A and B stacked as 2 x NumSamples rows, as
+            quasiRandomSample does with Replicates=2. Defaults to
+            toolbox.sampling.uniformLatinHypercubeSample.
+        Processes : int, optional
+            Number of worker processes, see integrateEnsemble.
+        Vectorized : bool, optional
+            Integrate each chunk as a stacked system, see
+            integrateEnsemble.
+        BlockSize : int, optional
+            Number of base samples per partial estimate.
+            Defaults to a tenth of NumSamples.
+        NumResamples : int, optional
+            Number of bootstrap resamples for the confidence
+            intervals.
+        Callback : function, optional
+            Called after each block as
+            Callback(Completed, Total, FirstOrder, TotalOrder)
+            with the partial estimates.
+        Cancel : function, optional
+            Polled after each block. If it returns True the
+            estimates from the samples evaluated so far are kept.
+        Seed : None, int or SeedSequence, optional
+            Root of the independent random streams of the two
+            base samples and the bootstrap, see
+            spawnRandomGenerators. The Sampler must then accept
+            a Seed argument like the toolbox samplers.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with the (parameters x time points x
+            species) indices placed into Global.FirstOrder and
+            Global.TotalOrder and their 95% bootstrap confidence
+            intervals, of shape (2 x parameters x time points x
+            species), into Global.FirstOrderInterval and
+            Global.TotalOrderInterval. Global.ParameterSets and
+            Global.Data hold the stacked base samples [A; B] and
+            their trajectories.
+
+        See Also
+        --------
+        calculateLocalSensitivities, integrateEnsemble,
+        uniformLatinHypercubeSample, uniformNullSpaceSample
+
+        Notes
+        -----
+        The model is integrated NumSamples x (P + 2) times on a
+        single worker pool. The AB_i rows are generated block by
+        block while iterEnsemble keeps only a bounded number of
+        chunks in flight, and the sums behind the estimators are
+        accumulated as blocks complete, so memory for the
+        perturbed samples does not grow with NumSamples.
+        Global.Data is allocated by createDataArray and can be
+        kept on disk with SimulationData.StorageDirectory.
+        The confidence intervals use the Poisson bootstrap, i.e.
+        each resample weights every base sample by a Poisson(1)
+        count, which can be accumulated in the same way.
+
+        Parameters marked in Parameters.FixedFlag, e.g. by the
+        screening of calculateElementaryEffects, get no AB_i
+        matrix, so P counts the free parameters only, and their
+        indices are NaN.
+
+        Indices are only meaningful for independent inputs.
+        Samples from uniformNullSpaceSample tie the kinetic
+        parameters to the remaining ones, and mixing columns of
+        A and B breaks that relation.
+    '''
+    # Import required packages
+    import multiprocessing
+    import numpy
+    import toolbox
+    from toolbox.simulation.createDataArray import createDataArray
+    from toolbox.simulation.integrateEnsemble import iterEnsemble
+    from toolbox.simulation.solveODESystem import getIntegratorOptions
+
+    if Sampler == None:
+        Sampler = toolbox.sampling.uniformLatinHypercubeSample
+    if Seed != None:
+        Streams = toolbox.sampling.spawnRandomGenerators(Seed, 3)
+        Draw = lambda Stream: Sampler(SciPyModel, Seed=Stream)
+    else:
+        Streams = [None, None, numpy.random]
+        Draw = lambda Stream: Sampler(SciPyModel)
+
+    # Check if time vector data is specified
+    try:
+        TimeVector = numpy.linspace(SciPyModel.SimulationData.TimeStart,
+                                    SciPyModel.SimulationData.TimeEnd,
+                                    SciPyModel.SimulationData.DataPoints)
+    except TypeError:
+        print('ERROR: Check time data values in SciPyModel object.')
+        return
+
+    Global = SciPyModel.SimulationData.Sensitivity.Global
+    NumSamples = Global.NumSamples
+    NumParameters = SciPyModel.Parameters.Quantity
+    NumOutputs = len(TimeVector) * SciPyModel.Species.Quantity
+
+    # Only parameters not marked as fixed get an AB_i matrix
+    FixedFlag = numpy.array(
+        SciPyModel.Parameters.FixedFlag or [False] * NumParameters, dtype=bool)
+    Free = numpy.flatnonzero(numpy.invert(FixedFlag))
+    NumFree = len(Free)
+
+    # Draw the independent base samples
+    SampleA = Draw(Streams[0]).SimulationData.Sensitivity.Global.ParameterSets
+    if SampleA is None:
+        print('ERROR: The Sampler did not return a parameter sample.')
+        return
+    if SampleA.shape[0] == 2 * NumSamples:
+        # The sampler returned A and B stacked, e.g. as the two halves of
+        # one quasi-random sequence
+        SampleA, SampleB = SampleA[:NumSamples], SampleA[NumSamples:]
+    else:
+        SampleB = Draw(
+            Streams[1]).SimulationData.Sensitivity.Global.ParameterSets
+        if SampleB is None:
+            print('ERROR: The Sampler did not return a parameter sample.')
+            return
+    Global.ParameterSets = numpy.vstack([SampleA, SampleB])
+    Global.Data = createDataArray(
+        SciPyModel, 'GlobalData',
+        (2 * NumSamples, len(TimeVector), SciPyModel.Species.Quantity))
+    Global.TimeVector = TimeVector
+
+    if Processes == None:
+        Processes = multiprocessing.cpu_count()
+    if BlockSize == None:
+        BlockSize = max(1, int(numpy.ceil(NumSamples / 10.)))
+    BlockRows = BlockSize * (NumFree + 2)
+    if Vectorized:
+        ChunkSize = max(1, int(numpy.ceil(BlockRows / float(Processes))))
+    else:
+        ChunkSize = max(1, int(numpy.ceil(BlockRows / (4.0 * Processes))))
+
+    def BlockTasks():
+        # Stack A, B and every AB_i of each block, generated only when
+        # the pool asks for more work
+        InitialValues = numpy.asarray(SciPyModel.Species.Value, dtype=float)
+        for Start in range(0, NumSamples, BlockSize):
+            BlockA = SampleA[Start:Start + BlockSize]
+            BlockB = SampleB[Start:Start + BlockSize]
+            BlockAB = numpy.repeat(BlockA[None], NumFree, axis=0)
+            for f_ix, p_ix in enumerate(Free):
+                BlockAB[f_ix, :, p_ix] = BlockB[:, p_ix]
+            Rows = numpy.vstack([BlockA, BlockB,
+                                 BlockAB.reshape(-1, NumParameters)])
+            for Row in range(0, Rows.shape[0], ChunkSize):
+                Chunk = Rows[Row:Row + ChunkSize]
+                yield ((Start, Row), Chunk,
+                       numpy.tile(InitialValues, (Chunk.shape[0], 1)))
+
+    # Weighted sums for the point estimate (row 0) and each bootstrap
+    # resample (rows 1 to NumResamples)
+    Weight = numpy.zeros(NumResamples + 1)
+    SumA = numpy.zeros((NumResamples + 1, NumOutputs))
+    SumSquareA = numpy.zeros((NumResamples + 1, NumOutputs))
+    SumB = numpy.zeros((NumResamples + 1, NumOutputs))
+    SumSquareB = numpy.zeros((NumResamples + 1, NumOutputs))
+    SumFirst = numpy.zeros((NumResamples + 1, NumFree, NumOutputs))
+    SumTotal = numpy.zeros((NumResamples + 1, NumFree, NumOutputs))
+    Offset = None
+    Completed = 0
+    Pending = {}
+
+    Results = iterEnsemble(SciPyModel.ToolboxFunctions.DerivativeFunction,
+                           getIntegratorOptions(SciPyModel), TimeVector,
+                           BlockTasks(), Processes, Vectorized,
+                           SciPyModel.Parameters.Value)
+    try:
+        for (Start, Row), Chunk in Results:
+
+            # Collect chunks until every row of the block has finished
+            Size = min(BlockSize, NumSamples - Start)
+            if Start not in Pending:
+                Pending[Start] = [numpy.empty(
+                    (Size * (NumFree + 2), ) + Chunk.shape[1:]), 0]
+            Pending[Start][0][Row:Row + Chunk.shape[0]] = Chunk
+            Pending[Start][1] += Chunk.shape[0]
+            if Pending[Start][1] < Size * (NumFree + 2):
+                continue
+            Simulations = Pending.pop(Start)[0]
+
+            Global.Data[Start:Start + Size] = Simulations[:Size]
+            Global.Data[NumSamples + Start:NumSamples + Start + Size] = (
+                Simulations[Size:2 * Size])
+
+            # Shift outputs by the first block mean to limit cancellation
+            Outputs = Simulations.reshape(-1, NumOutputs)
+            if Offset is None:
+                Offset = numpy.nanmean(Outputs[:Size], axis=0)
+                Offset[numpy.isnan(Offset)] = 0.
+            Outputs = Outputs - Offset
+            OutputA = Outputs[:Size]
+            OutputB = Outputs[Size:2 * Size]
+            OutputAB = Outputs[2 * Size:].reshape(NumFree, Size, NumOutputs)
+
+            # Drop samples with a failed simulation
+            Valid = (numpy.isfinite(OutputA).all(axis=1) &
+                     numpy.isfinite(OutputB).all(axis=1) &
+                     numpy.isfinite(OutputAB).all(axis=(0, 2)))
+            OutputA = numpy.where(Valid[:, None], OutputA, 0.)
+            OutputB = numpy.where(Valid[:, None], OutputB, 0.)
+            OutputAB = numpy.where(Valid[None, :, None], OutputAB, 0.)
+
+            # Poisson bootstrap weights
+            Weights = numpy.vstack([numpy.ones(Size), Streams[2].poisson(
+                1., (NumResamples, Size))]) * Valid
+
+            Weight += Weights.sum(axis=1)
+            SumA += Weights.dot(OutputA)
+            SumSquareA += Weights.dot(OutputA**2)
+            SumB += Weights.dot(OutputB)
+            SumSquareB += Weights.dot(OutputB**2)
+            SumFirst += numpy.einsum('rn,nq,inq->riq', Weights, OutputB,
+                                     OutputAB - OutputA)
+            SumTotal += numpy.einsum('rn,inq->riq', Weights,
+                                     (OutputA - OutputAB)**2)
+
+            # Partial estimates, NaN for fixed parameters
+            FirstOrder, TotalOrder = estimateSobolIndices(
+                Weight, SumA, SumSquareA, SumB, SumSquareB, SumFirst,
+                SumTotal)
+            Shape = (NumFree, len(TimeVector), SciPyModel.Species.Quantity)
+            Global.FirstOrder = numpy.full((NumParameters, ) + Shape[1:],
+                                           numpy.nan)
+            Global.TotalOrder = numpy.full((NumParameters, ) + Shape[1:],
+                                           numpy.nan)
+            Global.FirstOrderInterval = numpy.full(
+                (2, NumParameters) + Shape[1:], numpy.nan)
+            Global.TotalOrderInterval = numpy.full(
+                (2, NumParameters) + Shape[1:], numpy.nan)
+            Global.FirstOrder[Free] = FirstOrder[0].reshape(Shape)
+            Global.TotalOrder[Free] = TotalOrder[0].reshape(Shape)
+            Global.FirstOrderInterval[:, Free] = numpy.nanpercentile(
+                FirstOrder[1:], [2.5, 97.5], axis=0).reshape((2, ) + Shape)
+            Global.TotalOrderInterval[:, Free] = numpy.nanpercentile(
+                TotalOrder[1:], [2.5, 97.5], axis=0).reshape((2, ) + Shape)
+
+            Completed += Size
+            if Callback != None:
+                Callback(Completed, NumSamples, Global.FirstOrder,
+                         Global.TotalOrder)
+            if Cancel != None and Cancel():
+                break
+    finally:
+        Results.close()
+
+    return SciPyModel
+
+
+def estimateSobolIndices( Weight, SumA, SumSquareA, SumB, SumSquareB,
+                          SumFirst, SumTotal ):
+    '''
+        Turn the accumulated weighted sums into first-order and
+        total-order indices for every resample. Outputs with no
+        variance give NaN.
+    '''
+    import numpy
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        Mean = (SumA + SumB) / (2 * Weight[:, None])
+        Variance = (SumSquareA + SumSquareB) / (2 * Weight[:, None]) - Mean**2
+        Variance[Variance <= 0] = numpy.nan
+        FirstOrder = SumFirst / Weight[:, None, None] / Variance[:, None]
+        TotalOrder = SumTotal / (2 * Weight[:, None, None]) / Variance[:, None]
+
+    return FirstOrder, TotalOrder
@@ -1,17 +1,24 @@
-def calculateLocalSensitivities( SciPyModel ):
+def calculateLocalSensitivities( SciPyModel, Processes=None, Vectorized=False ):
     ''' 
         Caclulate local sensitivity coefficents for the
-        model. Sensitivities are calulated by way of the
-        centered difference approximation for the derivative
+        model. By default sensitivities are calulated by way of
+        the centered difference approximation for the derivative
         dx/dp. The approximation is then normalized by the
         parameter value and species value for the base
         simulation at each given time point.
 
+        The perturbed simulations for all parameters are run in
+        parallel by runEnsemble. Setting
+        SimulationData.Sensitivity.Local.Method to
+        'ForwardDifference' uses one-sided differences against
+        the base simulation, 'ComplexStep' uses complex-step
+        differentiation and 'ForwardSensitivity' integrates
+        the forward sensitivity equations instead, see
+        calculateForwardSensitivities.
+
         To Do
         -----
-        1. Enable parallelization of the loop to calculate
-           sensitivities.
-        2. Provide a way to pause the loop and continue
+        1. Provide a way to pause the loop and continue
            execution from the last position.
            
 
@@ -20,8 +27,17 @@ def calculateLocalSensitivities( SciPyModel ):
         SciPyModel : internal object instance
         
             SciPyModel object with basic model information
-            specified as well as the PercentVary field
-            specified.
+            specified. Local.PercentVary sets the relative
+            parameter perturbation (0.10 if not specified) and
+            Local.Method may be 'CenteredDifference' (default),
+            'ForwardDifference', 'ComplexStep' or
+            'ForwardSensitivity'.
+        Processes : int, optional
+            Number of worker processes for the perturbed
+            simulations. Defaults to the number of CPUs.
+        Vectorized : bool, optional
+            Integrate the perturbed simulations as stacked
+            systems, see integrateEnsemble.
         
         Returns
         -------
@@ -42,6 +58,35 @@ def calculateLocalSensitivities( SciPyModel ):
         is only valid within the neighborhood around
         the nominal parameterization specified in the model
         when this function is called.
+
+        The centered difference approximation needs 2P + 1
+        integrations for P parameters and the forward difference
+        approximation P + 1, at first order accuracy in
+        PercentVary rather than second.
+
+        The complex-step method integrates the model once per
+        parameter with p_k + i*h and takes dy/dp_k = Im(y) / h.
+        Without a subtraction there is no cancellation error,
+        so h = 1e-20 |p_k| gives derivatives accurate to the
+        integrator tolerances, and a cheap explicit method can
+        be used. PercentVary is ignored. Rate laws with
+        non-analytic functions such as abs or piecewise
+        definitions fall back to centered differences.
+
+        The perturbed simulations and Local.Data are allocated
+        by createDataArray, so they are memory-mapped files if
+        SimulationData.StorageDirectory is set.
+
+        Parameters marked in Parameters.FixedFlag are not
+        perturbed and their coefficients are NaN, except for the
+        forward sensitivity equations, which give all
+        coefficients in one solve.
+
+        The forward sensitivity
+        equations are a single integration of a system with
+        species x (P + 1) states, using the analytic Jacobians
+        generated by writeJacobianFunction, and are exact up to
+        the integrator tolerances.
     '''
     # Import required packages
     import os, sys, numpy
@@ -49,41 +94,243 @@ def calculateLocalSensitivities( SciPyModel ):
     if NotebookDirectory not in sys.path:
         sys.path.append(NotebookDirectory)
     import toolbox
+    from toolbox.simulation.createDataArray import createDataArray
+    from toolbox.simulation.integrateEnsemble import runEnsemble
+    from toolbox.simulation.solveODESystem import getIntegratorOptions
     
+    # Select the sensitivity method
+    if SciPyModel.SimulationData.Sensitivity.Local.Method == None:
+        SciPyModel.SimulationData.Sensitivity.Local.Method = 'CenteredDifference'
+    if SciPyModel.SimulationData.Sensitivity.Local.Method not in [
+            'CenteredDifference', 'ForwardDifference', 'ComplexStep',
+            'ForwardSensitivity']:
+        print('ERROR: Unknown local sensitivity Method ' +
+              repr(SciPyModel.SimulationData.Sensitivity.Local.Method) +
+              ', expected CenteredDifference, ForwardDifference, '
+              'ComplexStep or ForwardSensitivity.')
+        return
+
+    if (SciPyModel.SimulationData.Sensitivity.Local.Method ==
+            'ForwardSensitivity'):
+        return calculateForwardSensitivities(SciPyModel)
+
+    # Complex steps give wrong derivatives through non-analytic functions
+    if (SciPyModel.SimulationData.Sensitivity.Local.Method == 'ComplexStep'
+            and not checkComplexStep(SciPyModel)):
+        print('WARNING: Rate laws are not analytic, using centered '
+              'differences instead of complex steps.')
+        SciPyModel.SimulationData.Sensitivity.Local.Method = 'CenteredDifference'
+
     # Integrate Base Simulation
     SciPyModel = toolbox.simulation.integrateODEFunction(SciPyModel)
     BaseSimulation = SciPyModel.SimulationData.Deterministic.Data[:, :]
 
     # Create Holder for Base Parameterization
-    BaseParameters = SciPyModel.Parameters.Value[:]
+    BaseParameters = numpy.array(SciPyModel.Parameters.Value, dtype=float)
 
     # Set Local Sensitivity Parameters
-    SciPyModel.SimulationData.Sensitivity.Local.PercentVary = 0.10
-
-    # Initialize Sensitivity Capture Array
-    SciPyModel.SimulationData.Sensitivity.Local.Data = numpy.empty(
-        (SciPyModel.Parameters.Quantity, SciPyModel.SimulationData.DataPoints,
-         SciPyModel.Species.Quantity))
-
-    for i in range(SciPyModel.Parameters.Quantity):
-        # Reset Parameter Values
-        SciPyModel.Parameters.Value = BaseParameters
-
-        # High Parameter Simulation
-        SciPyModel.Parameters.Value[i] = BaseParameters[i] * (
-            1 + SciPyModel.SimulationData.Sensitivity.Local.PercentVary)
-        SciPyModel = toolbox.simulation.integrateODEFunction(SciPyModel)
-        HiSimulation = SciPyModel.SimulationData.Deterministic.Data[:, :]
-
-        # Low Parameter Simulation
-        SciPyModel.Parameters.Value[i] = BaseParameters[i] * (
-            1 - SciPyModel.SimulationData.Sensitivity.Local.PercentVary)
-        SciPyModel = toolbox.simulation.integrateODEFunction(SciPyModel)
-        LoSimulation = SciPyModel.SimulationData.Deterministic.Data[:, :]
-
-        # Calculate Sensitivities
-        SciPyModel.SimulationData.Sensitivity.Local.Data[i, :, :] = (
-            HiSimulation - LoSimulation) / (2 * BaseSimulation[
-                i] * SciPyModel.SimulationData.Sensitivity.Local.PercentVary)
-        
-    return SciPyModel
\ No newline at end of file
+    if SciPyModel.SimulationData.Sensitivity.Local.PercentVary == None:
+        SciPyModel.SimulationData.Sensitivity.Local.PercentVary = 0.10
+    PercentVary = SciPyModel.SimulationData.Sensitivity.Local.PercentVary
+
+    # Parameters marked as fixed are not perturbed
+    FixedFlag = numpy.array(SciPyModel.Parameters.FixedFlag or
+                            [False] * SciPyModel.Parameters.Quantity,
+                            dtype=bool)
+    Free = numpy.flatnonzero(numpy.invert(FixedFlag))
+
+    # Build one perturbed parameter set per free parameter, high
+    # perturbations first followed by the low perturbations for
+    # centered differences
+    Perturbation = numpy.diag(BaseParameters * PercentVary)[Free]
+    ParameterSets = BaseParameters + Perturbation
+    if (SciPyModel.SimulationData.Sensitivity.Local.Method ==
+            'CenteredDifference'):
+        ParameterSets = numpy.vstack(
+            [ParameterSets, BaseParameters - Perturbation])
+    elif SciPyModel.SimulationData.Sensitivity.Local.Method == 'ComplexStep':
+        StepSize = 1e-20 * numpy.where(BaseParameters == 0, 1.,
+                                       numpy.abs(BaseParameters))
+        ParameterSets = BaseParameters + 1j * numpy.diag(StepSize)[Free]
+
+    # Integrate the perturbed simulations with the integrator selected
+    # for the base simulation. Complex steps need a method supporting
+    # complex states, otherwise an explicit or BDF method is picked.
+    Options = getIntegratorOptions(SciPyModel)
+    Options['Method'] = SciPyModel.SimulationData.Deterministic.Method
+    if (SciPyModel.SimulationData.Sensitivity.Local.Method == 'ComplexStep'
+            and Options['Method'] not in ['BDF', 'RK23', 'RK45', 'DOP853']):
+        Options['Method'] = 'auto'
+    Simulations = createDataArray(
+        SciPyModel, 'LocalSimulations',
+        (ParameterSets.shape[0], ) + BaseSimulation.shape,
+        numpy.result_type(numpy.dtype(
+            SciPyModel.SimulationData.StorageDtype or float), ParameterSets))
+    Simulations = runEnsemble(
+        SciPyModel.ToolboxFunctions.DerivativeFunction, Options,
+        SciPyModel.SimulationData.Deterministic.TimeVector, ParameterSets,
+        SciPyModel.Species.Value, Processes, Vectorized=Vectorized,
+        Data=Simulations)
+
+    # Calculate Sensitivities normalized by the parameter value and
+    # the base simulation at each time point and species, one
+    # parameter at a time to bound memory use
+    SciPyModel.SimulationData.Sensitivity.Local.Data = createDataArray(
+        SciPyModel, 'LocalData',
+        (SciPyModel.Parameters.Quantity, ) + BaseSimulation.shape)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for f_ix, p_ix in enumerate(Free):
+            if (SciPyModel.SimulationData.Sensitivity.Local.Method ==
+                    'CenteredDifference'):
+                SciPyModel.SimulationData.Sensitivity.Local.Data[p_ix] = (
+                    Simulations[f_ix] - Simulations[len(Free) + f_ix]) / (
+                        2 * PercentVary * BaseSimulation)
+            elif (SciPyModel.SimulationData.Sensitivity.Local.Method ==
+                    'ComplexStep'):
+                SciPyModel.SimulationData.Sensitivity.Local.Data[p_ix] = (
+                    Simulations[f_ix].imag *
+                    (BaseParameters[p_ix] / StepSize[p_ix]) / BaseSimulation)
+            else:
+                SciPyModel.SimulationData.Sensitivity.Local.Data[p_ix] = (
+                    Simulations[f_ix] - BaseSimulation) / (
+                        PercentVary * BaseSimulation)
+
+    return SciPyModel
+
+
+def checkComplexStep( SciPyModel ):
+    '''
+        Return True if every rate law can be evaluated with
+        complex arguments to give complex-step derivatives,
+        i.e. no formula uses absolute values, rounding, min or
+        max, comparisons or piecewise definitions.
+    '''
+    import re
+
+    NonAnalytic = re.compile(
+        r'\b(abs|Abs|fabs|floor|ceil|ceiling|round|sign|min|max|Min|Max|'
+        r'Heaviside|piecewise|Piecewise)\s*\(|[<>]|==|!=|'
+        r'\b(and|or|not|if)\b')
+
+    for Formula in SciPyModel.Reactions.Formulas:
+        if NonAnalytic.search(Formula):
+            return False
+
+    return True
+
+
+def calculateForwardSensitivities( SciPyModel ):
+    '''
+        Calculate normalized local sensitivity coefficients by
+        integrating the forward sensitivity equations
+
+            dy/dt = f(y, p)
+            dX/dt = J X + df/dp,    X(0) = 0
+
+        for the state y and the (species x parameters)
+        sensitivity matrix X = dy/dp in a single solve. J and
+        df/dp are the analytic functions jac_fun and pjac_fun
+        from writeJacobianFunction. The coefficients are
+        normalized as X * p / y and stored in the (parameters
+        x time points x species) layout of Local.Data.
+
+        The augmented system is integrated with BDF unless
+        SimulationData.Method selects Radau, an explicit
+        solve_ivp method or 'auto', so the block-diagonal
+        Jacobian stays sparse.
+    '''
+    import numpy, scipy.sparse
+    import toolbox
+    from toolbox.simulation.createDataArray import createDataArray
+    from toolbox.simulation.solveODESystem import (getIntegratorOptions,
+                                                   solveODESystem)
+
+    # Generate the analytic Jacobians if they are missing
+    SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+    if not hasattr(SciPyModel.ToolboxFunctions.DerivativeModule, 'pjac_fun'):
+        SciPyModel = toolbox.simulation.writeJacobianFunction(SciPyModel)
+        SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+
+    # Check if time vector data is specified
+    try:
+        TimeVector = numpy.linspace(SciPyModel.SimulationData.TimeStart,
+                                    SciPyModel.SimulationData.TimeEnd,
+                                    SciPyModel.SimulationData.DataPoints)
+    except TypeError:
+        print('ERROR: Check time data values in SciPyModel object.')
+        return
+
+    NumSpecies = SciPyModel.Species.Quantity
+    NumParameters = SciPyModel.Parameters.Quantity
+    Parameters = numpy.array(SciPyModel.Parameters.Value, dtype=float)
+
+    # Integrate the state and its sensitivities together. The sparse
+    # block-diagonal Jacobian is only used by BDF and Radau, odeint and
+    # LSODA would densify it into a (species x (P + 1))^2 matrix.
+    Options = getIntegratorOptions(SciPyModel)
+    if Options['Method'] in [None, 'odeint', 'LSODA']:
+        Options['Method'] = 'BDF'
+    Options['SparseStoichiometry'] = True
+    if Options['JacobianSparsity'] is not None:
+        Options['JacobianSparsity'] = scipy.sparse.block_diag(
+            [Options['JacobianSparsity']] * (NumParameters + 1), format='csr')
+    Data, Interpolant, Method = solveODESystem(
+        createForwardSensitivitySystem(
+            SciPyModel.ToolboxFunctions.DerivativeModule, NumSpecies,
+            NumParameters),
+        numpy.concatenate([numpy.asarray(SciPyModel.Species.Value, dtype=float),
+                           numpy.zeros(NumSpecies * NumParameters)]),
+        TimeVector, Parameters, Options)
+
+    # Sensitivities are stored parameter by parameter after the state
+    BaseSimulation = Data[:, :NumSpecies]
+    Sensitivities = Data[:, NumSpecies:].reshape(
+        len(TimeVector), NumParameters, NumSpecies).transpose(1, 0, 2)
+
+    # Normalize by parameter value and species value at each time point
+    SciPyModel.SimulationData.Sensitivity.Local.Data = createDataArray(
+        SciPyModel, 'LocalData', Sensitivities.shape)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        SciPyModel.SimulationData.Sensitivity.Local.Data[...] = (
+            Sensitivities * Parameters[:, None, None] / BaseSimulation[None])
+
+    SciPyModel.SimulationData.Deterministic.Data = BaseSimulation
+    SciPyModel.SimulationData.Deterministic.TimeVector = TimeVector
+    SciPyModel.SimulationData.Deterministic.Method = Method
+
+    return SciPyModel
+
+
+def createForwardSensitivitySystem( DerivativeModule, NumSpecies,
+                                    NumParameters ):
+    '''
+        Wrap the compiled derivative module into a module whose
+        ode_fun and jac_fun describe the forward sensitivity
+        system. The state is [y, X[:, 0], ..., X[:, P - 1]].
+        jac_fun returns the block-diagonal scipy.sparse matrix
+        diag(J, J, ..., J), neglecting the second derivative
+        terms, which is sufficient for the Newton iterations of
+        implicit integrators.
+    '''
+    import types, numpy, scipy.sparse
+
+    def ode_fun(z, t, p):
+        y = z[:NumSpecies]
+        X = z[NumSpecies:].reshape(NumParameters, NumSpecies).T
+        J = DerivativeModule.jac_fun(y, t, p)
+        dX = J.dot(X) + DerivativeModule.pjac_fun(y, t, p)
+        if scipy.sparse.issparse(dX):
+            dX = dX.toarray()
+        return numpy.concatenate([DerivativeModule.ode_fun(y, t, p),
+                                  numpy.asarray(dX).T.ravel()])
+
+    def jac_fun(z, t, p):
+        J = scipy.sparse.csc_matrix(
+            DerivativeModule.jac_fun(z[:NumSpecies], t, p))
+        return scipy.sparse.block_diag([J] * (NumParameters + 1), format='csc')
+
+    System = types.ModuleType('SciPyModel_ForwardSensitivity')
+    System.ode_fun = ode_fun
+    System.jac_fun = jac_fun
+
+    return System
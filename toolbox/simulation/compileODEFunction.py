@@ -0,0 +1,70 @@
+def compileODEFunction( SciPyModel ):
+    '''
+        Compile the generated derivative function source into
+        an in-memory module. The module is cached on the
+        SciPyModel and only recompiled when the source produced
+        by writeODEFunction changes, i.e. when the formulas or
+        stoichiometry were rewritten.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that writeODEFunction was called.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with the compiled module placed into
+            SciPyModel.ToolboxFunctions.DerivativeModule.
+
+        See Also
+        --------
+        writeODEFunction, compileSource
+
+        Notes
+        -----
+        The compiled module exposes the same functions as the
+        generated source, e.g.
+
+        SciPyModel.ToolboxFunctions.DerivativeModule.ode_fun( y, t, p )
+
+        No file is written and nothing is added to sys.modules,
+        so concurrent workers never collide.
+    '''
+    import hashlib
+
+    Source = bytes(SciPyModel.ToolboxFunctions.DerivativeFunction)
+    Key = hashlib.sha1(Source).hexdigest()
+
+    # Reuse the cached module while the source is unchanged
+    if (SciPyModel.ToolboxFunctions.DerivativeModule != None
+            and SciPyModel.ToolboxFunctions.DerivativeKey == Key):
+        return SciPyModel
+
+    SciPyModel.ToolboxFunctions.DerivativeModule = compileSource(
+        Source, 'SciPyModel_' + Key)
+    SciPyModel.ToolboxFunctions.DerivativeKey = Key
+
+    return SciPyModel
+
+
+def compileSource( Source, Name ):
+    '''
+        Compile generated Python source into a new module
+        object without writing it to disk. The source is
+        registered with linecache so tracebacks through the
+        generated code still show the offending line.
+    '''
+    import types, linecache
+
+    Source = bytes(Source)
+    FileName = '<' + Name + '>'
+
+    Module = types.ModuleType(Name)
+    Module.__file__ = FileName
+    exec(compile(Source, FileName, 'exec'), Module.__dict__)
+
+    Lines = Source.decode('utf-8').splitlines(True)
+    linecache.cache[FileName] = (len(Source), None, Lines, FileName)
+
+    return Module
@@ -0,0 +1,62 @@
+def createDataArray( SciPyModel, Name, Shape, Dtype=None ):
+    '''
+        Allocate a NaN-filled result array of the given shape,
+        either in memory or as a memory-mapped .npy file.
+
+        To Do
+        -----
+        1. Chunked shards for arrays exceeding the file system
+           limits.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            If SimulationData.StorageDirectory is set the array
+            is created as the file Name.npy in that directory.
+            SimulationData.StorageDtype sets the element type,
+            e.g. 'float32', and defaults to float64.
+        Name : str
+            File name of the array without extension.
+        Shape : tuple
+            Shape of the array.
+        Dtype : numpy dtype, optional
+            Element type overriding StorageDtype, e.g. for
+            complex results.
+
+        Returns
+        -------
+        Data : numpy array or numpy memmap
+
+        See Also
+        --------
+        integrateEnsemble, calculateLocalSensitivities,
+        calculateGlobalSensitivities
+
+        Notes
+        -----
+        A memory-mapped array only holds the pages which were
+        recently read or written in RAM, so slicing it, e.g.
+        Data[:, :, ix] for one species, reads just that part
+        from disk. The file is an ordinary .npy file and can be
+        reopened with numpy.load(..., mmap_mode='r'). Existing
+        files of the same name are overwritten.
+    '''
+    import os, numpy
+    from numpy.lib.format import open_memmap
+
+    if Dtype == None:
+        Dtype = SciPyModel.SimulationData.StorageDtype
+    if Dtype == None:
+        Dtype = float
+
+    Directory = SciPyModel.SimulationData.StorageDirectory
+    if Directory == None:
+        return numpy.full(Shape, numpy.nan, dtype=Dtype)
+
+    if not os.path.isdir(Directory):
+        os.makedirs(Directory)
+    Data = open_memmap(os.path.join(Directory, Name + '.npy'), mode='w+',
+                       dtype=Dtype, shape=tuple(Shape))
+    Data[...] = numpy.nan
+
+    return Data
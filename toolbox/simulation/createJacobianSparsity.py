@@ -0,0 +1,57 @@
+def createJacobianSparsity( SciPyModel ):
+    '''
+        Determine which entries of the Jacobian can be nonzero
+        from the structure of the model alone. Each reaction
+        rate depends only on the species referenced as y[i]
+        within its vectorized formula, so the Jacobian pattern
+        is the product of the stoichiometry pattern and the
+        reaction-species dependency pattern.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires vectorized Reactions.Formulas and
+            Reactions.Stoichiometry, as set by importSBMLFile.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with Reactions.Dependency (reactions x
+            species) and Reactions.JacobianSparsity (species x
+            species) filled as boolean scipy.sparse matrices.
+
+        See Also
+        --------
+        importSBMLFile, integrateODEFunction
+
+        Notes
+        -----
+        The pattern is passed to scipy.integrate.solve_ivp as
+        jac_sparsity, so implicit methods estimate the Jacobian
+        with grouped finite differences and factor it with a
+        sparse LU decomposition.
+    '''
+    # Import required packages
+    import re, numpy, scipy.sparse
+
+    # Collect the species referenced by each reaction rate
+    Rows = []
+    Columns = []
+    for rxn_ix in range(SciPyModel.Reactions.Quantity):
+        for s_ix in sorted(set(re.findall(
+                r'\by\[(\d+)\]', SciPyModel.Reactions.Formulas[rxn_ix]))):
+            Rows.append(rxn_ix)
+            Columns.append(int(s_ix))
+
+    SciPyModel.Reactions.Dependency = scipy.sparse.csc_matrix(
+        (numpy.ones(len(Rows), dtype=bool), (Rows, Columns)),
+        shape=(SciPyModel.Reactions.Quantity, SciPyModel.Species.Quantity))
+
+    # Species i depends on species j if some reaction changing i uses j
+    StoichiometryPattern = scipy.sparse.csr_matrix(
+        SciPyModel.Reactions.Stoichiometry != 0, dtype=float)
+    SciPyModel.Reactions.JacobianSparsity = scipy.sparse.csr_matrix(
+        StoichiometryPattern.dot(
+            SciPyModel.Reactions.Dependency.astype(float)) != 0)
+
+    return SciPyModel
@@ -0,0 +1,311 @@
+def integrateEnsemble( SciPyModel, Processes=None, ChunkSize=None,
+                       Callback=None, Cancel=None, Vectorized=False ):
+    '''
+        Integrate the model once for every parameter set in
+        SciPyModel.SimulationData.Sensitivity.Global.ParameterSets
+        on a pool of worker processes.
+
+        To Do
+        -----
+        1. Allow per-set time vectors.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that writeODEFunction was called, the time
+            data in SimulationData is specified and ParameterSets
+            holds one parameter vector per row. If
+            Global.InitialValues holds one row per parameter set
+            these are used as initial conditions, otherwise every
+            simulation starts from Species.Value.
+        Processes : int, optional
+            Number of worker processes. Defaults to the number
+            of CPUs. A value of 1 integrates in the current
+            process.
+        ChunkSize : int, optional
+            Number of parameter sets sent to a worker at a time.
+        Callback : function, optional
+            Called as Callback(Completed, Total) each time a
+            chunk finishes.
+        Cancel : function, optional
+            Polled after each chunk. If it returns True the
+            remaining simulations are abandoned.
+        Vectorized : bool, optional
+            Integrate each chunk as one stacked system with the
+            batched derivative function ode_fun_batch instead of
+            one call per parameter set. Chunks then default to
+            one per worker process.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel with the (parameter sets x time points x
+            species) trajectories placed into
+            SciPyModel.SimulationData.Sensitivity.Global.Data
+            and the time vector into Global.TimeVector. The
+            array is allocated by createDataArray, so it is
+            memory-mapped if SimulationData.StorageDirectory is
+            set.
+
+        See Also
+        --------
+        integrateODEFunction, runEnsemble, iterEnsemble
+
+        Notes
+        -----
+        The generated derivative source is sent to each worker
+        once and compiled there, so the model is not pickled
+        with every task. Simulations which fail, or were not
+        run because of cancellation, are left as NaN.
+
+        Vectorized integration removes the per-simulation
+        Python overhead, which dominates for ensembles of small
+        models. The members of a chunk share step size control,
+        see solveBatchODESystem.
+
+        The integrator settings of SimulationData apply to
+        every simulation. An 'auto' method is resolved once for
+        the nominal parameterization, so all members of the
+        ensemble use the same integrator.
+    '''
+    # Import required packages
+    import numpy
+    from toolbox.simulation.createDataArray import createDataArray
+    from toolbox.simulation.solveODESystem import getIntegratorOptions
+
+    # Check if time vector data is specified
+    try:
+        TimeVector = numpy.linspace(SciPyModel.SimulationData.TimeStart,
+                                    SciPyModel.SimulationData.TimeEnd,
+                                    SciPyModel.SimulationData.DataPoints)
+    except TypeError:
+        print('ERROR: Check time data values in SciPyModel object.')
+        return
+
+    Global = SciPyModel.SimulationData.Sensitivity.Global
+    InitialValues = Global.InitialValues
+    if InitialValues is None:
+        InitialValues = SciPyModel.Species.Value
+
+    Global.Data = createDataArray(
+        SciPyModel, 'GlobalData',
+        (numpy.atleast_2d(Global.ParameterSets).shape[0], len(TimeVector),
+         SciPyModel.Species.Quantity))
+    Global.Data = runEnsemble(
+        SciPyModel.ToolboxFunctions.DerivativeFunction,
+        getIntegratorOptions(SciPyModel), TimeVector, Global.ParameterSets,
+        InitialValues, Processes, ChunkSize, Callback, Cancel,
+        NominalParameters=SciPyModel.Parameters.Value, Vectorized=Vectorized,
+        Data=Global.Data)
+    Global.TimeVector = TimeVector
+
+    return SciPyModel
+
+
+def runEnsemble( Source, Options, TimeVector, ParameterSets, InitialValues,
+                 Processes=None, ChunkSize=None, Callback=None, Cancel=None,
+                 NominalParameters=None, Vectorized=False, Data=None ):
+    '''
+        Integrate the derivative function in Source for every
+        row of ParameterSets and return a preallocated
+        (sets x time points x species) array. If Data is given
+        the results are written into it instead, e.g. into an
+        array from createDataArray, and rows which were not
+        integrated are left untouched.
+
+        InitialValues is either a single initial condition
+        vector shared by all simulations or one row per
+        parameter set. Complex parameter sets are integrated in
+        the complex domain. Options is the dictionary returned by
+        getIntegratorOptions. The chunks are run by
+        iterEnsemble.
+    '''
+    import multiprocessing
+    import numpy
+
+    ParameterSets = numpy.atleast_2d(numpy.asarray(ParameterSets))
+    ParameterSets = ParameterSets.astype(numpy.result_type(ParameterSets, 1.))
+    InitialValues = numpy.asarray(InitialValues)
+    InitialValues = InitialValues.astype(
+        numpy.result_type(InitialValues, ParameterSets))
+    NumSets = ParameterSets.shape[0]
+    NumSpecies = InitialValues.shape[-1]
+    if InitialValues.ndim == 1:
+        InitialValues = numpy.tile(InitialValues, (NumSets, 1))
+
+    if Data is None:
+        Data = numpy.full((NumSets, len(TimeVector), NumSpecies), numpy.nan,
+                          dtype=InitialValues.dtype)
+    if NumSets == 0:
+        return Data
+
+    if Processes is None:
+        Processes = multiprocessing.cpu_count()
+    if ChunkSize is None and Vectorized:
+        ChunkSize = max(1, int(numpy.ceil(NumSets / float(Processes))))
+    elif ChunkSize is None:
+        ChunkSize = max(1, int(numpy.ceil(NumSets / (4.0 * Processes))))
+    Tasks = [(Start, ParameterSets[Start:Start + ChunkSize],
+              InitialValues[Start:Start + ChunkSize])
+             for Start in range(0, NumSets, ChunkSize)]
+    if len(Tasks) < 2:
+        Processes = 1
+
+    # Fill the preallocated array as chunks finish
+    Completed = 0
+    Results = iterEnsemble(Source, Options, TimeVector, Tasks, Processes,
+                           Vectorized, NominalParameters)
+    try:
+        for Start, Block in Results:
+            Data[Start:Start + Block.shape[0]] = Block
+            Completed += Block.shape[0]
+            if Callback != None:
+                Callback(Completed, NumSets)
+            if Cancel != None and Cancel():
+                break
+    finally:
+        Results.close()
+
+    return Data
+
+
+def iterEnsemble( Source, Options, TimeVector, Tasks, Processes=None,
+                  Vectorized=False, NominalParameters=None ):
+    '''
+        Integrate chunks of parameter sets on a pool of worker
+        processes and yield (Key, Data) as each chunk finishes.
+        Tasks is an iterable of (Key, ParameterSets,
+        InitialValues) chunks with one row per simulation, and
+        Data is the (rows x time points x species) result.
+        At most 2 x Processes tasks are in flight at a time and
+        the next task is only taken from Tasks when a result is
+        collected, so a lazily generated Tasks never needs to be
+        held in memory at once. The pool is kept until the
+        generator is exhausted or closed.
+
+        An 'auto' method is resolved once at NominalParameters,
+        or the first parameter set, before the work is
+        distributed. With Vectorized set, each chunk is
+        integrated as one stacked system by solveBatchODESystem.
+        Processes of 1 integrates in the current process.
+    '''
+    import itertools, multiprocessing, queue
+    import numpy
+    from toolbox.simulation.compileODEFunction import compileSource
+    from toolbox.simulation.solveODESystem import probeStiffness
+
+    Tasks = iter(Tasks)
+    try:
+        FirstTask = next(Tasks)
+    except StopIteration:
+        return
+    Tasks = itertools.chain([FirstTask], Tasks)
+
+    # Continuous solutions can not be returned from worker processes
+    Options = dict(Options)
+    Options['DenseOutput'] = False
+    Source = bytes(Source)
+
+    if Options['Method'] == 'auto':
+        if NominalParameters is None:
+            NominalParameters = FirstTask[1][0]
+        if probeStiffness(compileSource(Source, 'SciPyModel_Ensemble'),
+                          FirstTask[2][0], TimeVector,
+                          numpy.real(numpy.asarray(NominalParameters)),
+                          Options):
+            Options['Method'] = 'BDF'
+        else:
+            Options['Method'] = 'RK45'
+
+    if Processes == 1:
+        Pool = None
+        initializeEnsembleWorker(Source, Options, TimeVector, Vectorized)
+    else:
+        Pool = multiprocessing.Pool(Processes, initializeEnsembleWorker,
+                                    (Source, Options, TimeVector, Vectorized))
+
+    try:
+        if Pool == None:
+            for Task in Tasks:
+                yield ensembleWorker(Task)
+            return
+
+        # Keep a bounded window of tasks in flight. Pool.imap_unordered
+        # would consume the whole task iterator up front.
+        Finished = queue.Queue()
+        def Submit(Task):
+            Pool.apply_async(ensembleWorker, (Task, ),
+                             callback=Finished.put,
+                             error_callback=Finished.put)
+        InFlight = 0
+        for Task in itertools.islice(Tasks, 2 * Processes):
+            Submit(Task)
+            InFlight += 1
+        while InFlight > 0:
+            Result = Finished.get()
+            InFlight -= 1
+            if isinstance(Result, BaseException):
+                raise Result
+            for Task in itertools.islice(Tasks, 1):
+                Submit(Task)
+                InFlight += 1
+            yield Result
+    finally:
+        if Pool != None:
+            Pool.terminate()
+            Pool.join()
+        WorkerState.clear()
+
+
+# Compiled model and settings held by each worker process
+WorkerState = {}
+
+
+def initializeEnsembleWorker( Source, Options, TimeVector, Vectorized=False ):
+    '''
+        Pool initializer. Compiles the derivative source once
+        per worker process.
+    '''
+    from toolbox.simulation.compileODEFunction import compileSource
+
+    WorkerState['Module'] = compileSource(Source, 'SciPyModel_Ensemble')
+    WorkerState['Options'] = Options
+    WorkerState['TimeVector'] = TimeVector
+    WorkerState['Vectorized'] = Vectorized
+
+
+def ensembleWorker( Task ):
+    '''
+        Integrate one chunk of parameter sets. Runs inside a
+        worker process and returns (Key, Block).
+    '''
+    import numpy
+    from toolbox.simulation.solveODESystem import (solveODESystem,
+                                                   solveBatchODESystem)
+
+    Key, ParameterBlock, InitialBlock = Task
+    TimeVector = WorkerState['TimeVector']
+
+    if WorkerState['Vectorized']:
+        try:
+            return Key, solveBatchODESystem(
+                WorkerState['Module'], InitialBlock, TimeVector,
+                ParameterBlock, WorkerState['Options'])[0]
+        except Exception as Error:
+            print('ERROR: Chunk %r: %s' % (Key, Error))
+
+    # Integrate one parameter set at a time, also as a fallback if the
+    # stacked system could not be integrated
+    Block = numpy.full(
+        (ParameterBlock.shape[0], len(TimeVector), InitialBlock.shape[1]),
+        numpy.nan, dtype=InitialBlock.dtype)
+
+    for ix in range(ParameterBlock.shape[0]):
+        try:
+            Block[ix] = solveODESystem(
+                WorkerState['Module'], InitialBlock[ix], TimeVector,
+                ParameterBlock[ix], WorkerState['Options'])[0]
+        except Exception as Error:
+            print('ERROR: Chunk %r, parameter set %d: %s' % (Key, ix, Error))
+
+    return Key, Block
@@ -6,15 +6,24 @@ def integrateODEFunction(SciPyModel):
         SciPyModel structure for further analysis,
         visualization, and exporting to file.
         
-        The function uses the SciPy.integrate method odeint
-        to perform the integration. The method is robust
-        for both stiff and non-stiff models (LSODA).
-
-        To Do
-        -----
-        1. Possibly switch from odeint to ode in order to allow
-           user choice in integrator.
-        2. Check issues with deleting temp file.
+        By default the function uses the SciPy.integrate method
+        odeint to perform the integration. The method is robust
+        for both stiff and non-stiff models (LSODA). If
+        writeJacobianFunction was called, the analytic
+        Jacobian is passed to the integrator instead of letting
+        it approximate the Jacobian by finite differences.
+        
+        The integrator is selected by the following fields of
+        SciPyModel.SimulationData:
+        
+        Method            -- None (odeint), 'LSODA', 'BDF',
+                             'Radau', 'RK23', 'RK45', 'DOP853'
+                             (solve_ivp) or 'auto'
+        RelativeTolerance -- rtol, integrator default if None
+        AbsoluteTolerance -- atol, integrator default if None
+        MaximumStep       -- largest allowed step size
+        FirstStep         -- initial step size
+        DenseOutput       -- keep a continuous solution
 
         Parameters
         ----------
@@ -28,25 +37,39 @@ def integrateODEFunction(SciPyModel):
             
         See Also
         --------
-        scipy.integrate.odeint
+        scipy.integrate.odeint, scipy.integrate.solve_ivp,
+        compileODEFunction, writeJacobianFunction, solveODESystem
         
         Notes
         -----
+        The 'auto' method takes a short run of explicit RK45
+        steps and switches to the implicit 'BDF' method if the
+        explicit step sizes are limited by stability. The
+        method actually used is stored in
+        SciPyModel.SimulationData.Deterministic.Method.
+        
+        Without an analytic Jacobian, BDF and Radau receive
+        SciPyModel.Reactions.JacobianSparsity, so large models
+        use grouped finite differences and sparse LU.
         
+        With DenseOutput set and a solve_ivp method, the
+        continuous solution is stored as a function of time in
+        SciPyModel.SimulationData.Deterministic.Interpolant.
+
+        The solve_ivp methods, DOP853 in particular, need SciPy
+        1.4 or later and therefore Python 3.
     '''
     
     # Import NumPy, SciPy.integrate, pand packages.
-    from scipy.integrate import odeint
-    import numpy, os, datetime
+    import numpy
+    import scipy.integrate
+    import toolbox
+    from toolbox.simulation.solveODESystem import (getIntegratorOptions,
+                                                   solveODESystem)
 
-    # Write derivative function to file.
-    TempName = (SciPyModel.MetaData.Name
-                +datetime.datetime.now().strftime("%I%M%p%B%d%Y")
-                +'.py')
-    open(TempName, 'w+').write(SciPyModel.ToolboxFunctions.DerivativeFunction)
-    
-    # Import derivative function from temporary file.
-    TempModule = __import__(TempName[:-3])
+    # Compile derivative function in memory, reusing the cached module.
+    SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+    DerivativeModule = SciPyModel.ToolboxFunctions.DerivativeModule
 
     # Check if time vector data is specified -   
     try:
@@ -56,22 +79,25 @@ def integrateODEFunction(SciPyModel):
             SciPyModel.SimulationData.TimeEnd,
             SciPyModel.SimulationData.DataPoints)
     except TypeError:
-        print "ERROR: Check time data values in SciPyModel object."
+        print("ERROR: Check time data values in SciPyModel object.")
         return
 
-    # Integrate using odeint method.
-    SciPyModel.SimulationData.Deterministic.Data = (odeint(
-        TempModule.ode_fun, SciPyModel.Species.Value,
-        tempTimeVector, args=(SciPyModel.Parameters.Value, )))
+    # Check that the installed SciPy provides the selected backend.
+    Method = SciPyModel.SimulationData.Method
+    if (Method not in [None, 'odeint', 'auto'] and
+            not hasattr(scipy.integrate, str(Method))):
+        print('ERROR: Integration method ' + repr(Method) + ' is not '
+              'provided by the installed SciPy. The solve_ivp methods, '
+              'e.g. DOP853, require SciPy 1.4 or later.')
+        return
+
+    # Integrate with the selected backend.
+    (SciPyModel.SimulationData.Deterministic.Data,
+     SciPyModel.SimulationData.Deterministic.Interpolant,
+     SciPyModel.SimulationData.Deterministic.Method) = solveODESystem(
+         DerivativeModule, SciPyModel.Species.Value, tempTimeVector,
+         SciPyModel.Parameters.Value, getIntegratorOptions(SciPyModel))
 
     SciPyModel.SimulationData.Deterministic.TimeVector = tempTimeVector
     
-    # Delete temporary file
-#     try:
-#         os.remove(TempName)
-#     except OSError:
-#         print 'ERROR: Temporary file has already been deleted.'
-#     else:
-#         print 'ERROR: Unknown error. Unable to remove '+TempName
-    
     return SciPyModel
\ No newline at end of file
@@ -0,0 +1,306 @@
+def getIntegratorOptions( SciPyModel ):
+    '''
+        Collect the integrator settings stored in
+        SciPyModel.SimulationData into a plain dictionary
+        which can be passed to solveODESystem, including
+        from worker processes.
+    '''
+    import scipy.sparse
+
+    return {
+        'Method': SciPyModel.SimulationData.Method,
+        'RelativeTolerance': SciPyModel.SimulationData.RelativeTolerance,
+        'AbsoluteTolerance': SciPyModel.SimulationData.AbsoluteTolerance,
+        'MaximumStep': SciPyModel.SimulationData.MaximumStep,
+        'FirstStep': SciPyModel.SimulationData.FirstStep,
+        'DenseOutput': SciPyModel.SimulationData.DenseOutput,
+        'JacobianSparsity': SciPyModel.Reactions.JacobianSparsity,
+        'SparseStoichiometry': scipy.sparse.issparse(
+            SciPyModel.Reactions.Stoichiometry)
+    }
+
+
+def probeStiffness( DerivativeModule, InitialValue, TimeVector, Parameters,
+                    Options, ProbeSteps=100 ):
+    '''
+        Take up to ProbeSteps explicit RK45 steps and report
+        whether the problem appears stiff. Following the test
+        used by Hairer and Wanner in DOPRI5, the dominant
+        eigenvalue is estimated from the last two stages of each
+        step, which are evaluated at the same time,
+
+            rho = ||k7 - k6|| / ||y7 - y6||
+
+        and a step is stability limited when h * rho exceeds the
+        RK45 stability boundary of 3.3. The problem is stiff if
+        the explicit solver fails, or if a quarter of the probe
+        steps are stability limited before the end of the time
+        span is reached.
+    '''
+    import numpy
+    from scipy.integrate import RK45
+
+    Settings = {}
+    if Options['RelativeTolerance'] != None:
+        Settings['rtol'] = Options['RelativeTolerance']
+    if Options['AbsoluteTolerance'] != None:
+        Settings['atol'] = Options['AbsoluteTolerance']
+
+    # Probe with the real part of complex-step perturbed problems
+    Parameters = numpy.real(numpy.asarray(Parameters))
+    Solver = RK45(lambda t, y: DerivativeModule.ode_fun(y, t, Parameters),
+                  TimeVector[0], numpy.real(numpy.asarray(InitialValue,
+                                                          dtype=complex)),
+                  TimeVector[-1], **Settings)
+
+    StiffSteps = 0
+    for Step in range(ProbeSteps):
+        PreviousValue = Solver.y.copy()
+        Solver.step()
+        if Solver.status == 'failed':
+            return True
+        if Solver.status == 'finished':
+            return False
+
+        # Sixth stage point, evaluated at the same time as the new step
+        StepSize = Solver.h_previous
+        StageValue = PreviousValue + StepSize * Solver.K[:-2].T.dot(
+            Solver.A[-1])
+        Change = numpy.linalg.norm(Solver.y - StageValue)
+        if Change > 0:
+            Rho = numpy.linalg.norm(Solver.K[-1] - Solver.K[-2]) / Change
+            if StepSize * Rho > 3.3:
+                StiffSteps += 1
+
+    return StiffSteps >= ProbeSteps // 4
+
+
+def solveODESystem( DerivativeModule, InitialValue, TimeVector, Parameters,
+                    Options ):
+    '''
+        Integrate the compiled derivative function with the
+        backend selected in Options['Method']:
+
+        None      -- scipy.integrate.odeint (LSODA), the default
+        'LSODA', 'BDF', 'Radau', 'RK23', 'RK45', 'DOP853'
+                  -- scipy.integrate.solve_ivp
+        'auto'    -- probe stiffness with explicit steps and use
+                     'BDF' if stiff, otherwise 'RK45'
+
+        The solve_ivp methods require SciPy 1.4 or later.
+
+        Complex Parameters or InitialValue are integrated in the
+        complex domain, which 'BDF' and the explicit methods
+        support.
+
+        The analytic jac_fun is passed to implicit methods if
+        writeJacobianFunction was called. Otherwise BDF and
+        Radau receive the Jacobian sparsity pattern.
+
+        Returns
+        -------
+        Data : numpy array
+            (time points x species) solution. Rows after a
+            failed integration are filled with NaN.
+        Interpolant : function or None
+            Continuous solution if Options['DenseOutput'] is set
+            and a solve_ivp method was used.
+        Method : str or None
+            The backend actually used.
+    '''
+    import numpy
+    from scipy.integrate import odeint, solve_ivp
+
+    Method = Options['Method']
+    if Method == 'auto':
+        if probeStiffness(DerivativeModule, InitialValue, TimeVector,
+                          Parameters, Options):
+            Method = 'BDF'
+        else:
+            Method = 'RK45'
+
+    # Use the analytic Jacobian if writeJacobianFunction was called.
+    JacobianFunction = getattr(DerivativeModule, 'jac_fun', None)
+    DenseJacobianFunction = JacobianFunction
+    if JacobianFunction != None and Options['SparseStoichiometry']:
+        DenseJacobianFunction = lambda y, t, p: JacobianFunction(
+            y, t, p).toarray()
+
+    if Method == None or Method == 'odeint':
+        # Integrate using odeint method.
+        Settings = {}
+        if Options['RelativeTolerance'] != None:
+            Settings['rtol'] = Options['RelativeTolerance']
+        if Options['AbsoluteTolerance'] != None:
+            Settings['atol'] = Options['AbsoluteTolerance']
+        if Options['MaximumStep'] != None:
+            Settings['hmax'] = Options['MaximumStep']
+        if Options['FirstStep'] != None:
+            Settings['h0'] = Options['FirstStep']
+        Data = odeint(DerivativeModule.ode_fun, InitialValue, TimeVector,
+                      args=(Parameters, ), Dfun=DenseJacobianFunction,
+                      **Settings)
+        return Data, None, Method
+
+    # Assemble solve_ivp settings
+    Settings = {'method': Method, 't_eval': TimeVector,
+                'dense_output': bool(Options['DenseOutput'])}
+    if Options['RelativeTolerance'] != None:
+        Settings['rtol'] = Options['RelativeTolerance']
+    if Options['AbsoluteTolerance'] != None:
+        Settings['atol'] = Options['AbsoluteTolerance']
+    if Options['MaximumStep'] != None:
+        Settings['max_step'] = Options['MaximumStep']
+    if Options['FirstStep'] != None:
+        Settings['first_step'] = Options['FirstStep']
+
+    # Implicit methods use the analytic Jacobian or its sparsity pattern
+    if Method in ['BDF', 'Radau']:
+        if JacobianFunction != None:
+            Settings['jac'] = lambda t, y: JacobianFunction(y, t, Parameters)
+        elif Options['JacobianSparsity'] is not None:
+            Settings['jac_sparsity'] = Options['JacobianSparsity']
+    elif Method == 'LSODA' and JacobianFunction != None:
+        Settings['jac'] = lambda t, y: DenseJacobianFunction(y, t, Parameters)
+
+    # Integrate using solve_ivp method. Complex parameters, as used by
+    # complex-step differentiation, require a complex state.
+    InitialValue = numpy.asarray(InitialValue, dtype=numpy.result_type(
+        numpy.asarray(InitialValue), numpy.asarray(Parameters), 1.))
+    Solution = solve_ivp(
+        lambda t, y: DerivativeModule.ode_fun(y, t, Parameters),
+        (TimeVector[0], TimeVector[-1]), InitialValue, **Settings)
+
+    # Keep the (time points x species) shape if integration stopped early
+    Data = numpy.full((len(TimeVector), len(InitialValue)), numpy.nan,
+                      dtype=InitialValue.dtype)
+    Data[:Solution.y.shape[1], :] = Solution.y.transpose()
+    if not Solution.success:
+        print('ERROR: ' + Solution.message)
+
+    return Data, Solution.sol, Method
+
+
+def solveBatchODESystem( DerivativeModule, InitialValues, TimeVector,
+                         ParameterSets, Options ):
+    '''
+        Integrate N members of an ensemble as one stacked system
+        using the batched derivative function ode_fun_batch, so
+        every right-hand side evaluation advances all members
+        with a single vectorized call. Row i of InitialValues
+        and ParameterSets belongs to member i.
+
+        The stacked Jacobian is block diagonal. odeint and LSODA
+        are told it is banded with half bandwidth species - 1,
+        while BDF and Radau receive the block-diagonal sparsity
+        pattern, so finite-difference Jacobians take a number of
+        batched evaluations independent of N.
+
+        Returns
+        -------
+        Data : numpy array
+            (members x time points x species) solution. Rows
+            after a failed integration are filled with NaN.
+        Method : str or None
+            The backend actually used.
+
+        Notes
+        -----
+        Step size control is shared by the stacked system, there
+        is no per-member step control, so one stiff or fast
+        member shortens the steps of the whole batch.
+
+        odeint measures the error in the weighted maximum norm,
+        so every member meets the tolerances as on its own.
+        solve_ivp uses the root mean square over the whole
+        stacked state, in which the error of a single member may
+        reach sqrt(N) times the tolerance. Its rtol and atol,
+        or their defaults 1e-3 and 1e-6, are therefore divided
+        by sqrt(N), which keeps the error of every member within
+        the requested tolerances at the cost of more steps.
+    '''
+    import numpy, scipy.sparse
+    from scipy.integrate import odeint, solve_ivp
+
+    ParameterSets = numpy.atleast_2d(numpy.asarray(ParameterSets))
+    ParameterSets = ParameterSets.astype(numpy.result_type(ParameterSets, 1.))
+    InitialValues = numpy.atleast_2d(numpy.asarray(InitialValues)).astype(
+        numpy.result_type(numpy.asarray(InitialValues), ParameterSets))
+    NumMembers, NumSpecies = InitialValues.shape
+
+    Method = Options['Method']
+    if Method == 'auto':
+        if probeStiffness(DerivativeModule, InitialValues[0], TimeVector,
+                          ParameterSets[0], Options):
+            Method = 'BDF'
+        else:
+            Method = 'RK45'
+
+    def StackedFunction(y, t):
+        return DerivativeModule.ode_fun_batch(
+            y.reshape(NumMembers, NumSpecies), t, ParameterSets).ravel()
+
+    if Method == None or Method == 'odeint':
+        # Integrate using odeint method with a banded Jacobian.
+        Settings = {'ml': NumSpecies - 1, 'mu': NumSpecies - 1}
+        if Options['RelativeTolerance'] != None:
+            Settings['rtol'] = Options['RelativeTolerance']
+        if Options['AbsoluteTolerance'] != None:
+            Settings['atol'] = Options['AbsoluteTolerance']
+        if Options['MaximumStep'] != None:
+            Settings['hmax'] = Options['MaximumStep']
+        if Options['FirstStep'] != None:
+            Settings['h0'] = Options['FirstStep']
+        Data = odeint(StackedFunction, InitialValues.ravel(), TimeVector,
+                      **Settings)
+        return (Data.reshape(len(TimeVector), NumMembers, NumSpecies)
+                .transpose(1, 0, 2)), Method
+
+    # Assemble solve_ivp settings. The root mean square error norm over
+    # N members allows one member an error of sqrt(N) times the
+    # tolerance, so the tolerances are tightened by 1 / sqrt(N).
+    Settings = {'method': Method, 't_eval': TimeVector}
+    Scale = 1. / numpy.sqrt(NumMembers)
+    RelativeTolerance = Options['RelativeTolerance']
+    if RelativeTolerance == None:
+        RelativeTolerance = 1e-3
+    Settings['rtol'] = max(RelativeTolerance * Scale,
+                           100 * numpy.finfo(float).eps)
+    AbsoluteTolerance = Options['AbsoluteTolerance']
+    if AbsoluteTolerance is None:
+        AbsoluteTolerance = 1e-6
+    AbsoluteTolerance = numpy.asarray(AbsoluteTolerance, dtype=float) * Scale
+    if AbsoluteTolerance.ndim == 1:
+        AbsoluteTolerance = numpy.tile(AbsoluteTolerance, NumMembers)
+    Settings['atol'] = AbsoluteTolerance
+    if Options['MaximumStep'] != None:
+        Settings['max_step'] = Options['MaximumStep']
+    if Options['FirstStep'] != None:
+        Settings['first_step'] = Options['FirstStep']
+
+    # Implicit methods use the block-diagonal Jacobian pattern
+    if Method in ['BDF', 'Radau']:
+        Pattern = Options['JacobianSparsity']
+        if Pattern is None:
+            Pattern = numpy.ones((NumSpecies, NumSpecies))
+        Settings['jac_sparsity'] = scipy.sparse.kron(
+            scipy.sparse.identity(NumMembers), Pattern, format='csc')
+    elif Method == 'LSODA':
+        Settings['lband'] = NumSpecies - 1
+        Settings['uband'] = NumSpecies - 1
+
+    # Integrate using solve_ivp method.
+    Solution = solve_ivp(lambda t, y: StackedFunction(y, t),
+                         (TimeVector[0], TimeVector[-1]),
+                         InitialValues.ravel(), **Settings)
+
+    # Keep the (members x time points x species) shape if integration
+    # stopped early
+    Data = numpy.full((NumMembers, len(TimeVector), NumSpecies), numpy.nan,
+                      dtype=InitialValues.dtype)
+    Data[:, :Solution.y.shape[1], :] = Solution.y.reshape(
+        NumMembers, NumSpecies, -1).transpose(0, 2, 1)
+    if not Solution.success:
+        print('ERROR: ' + Solution.message)
+
+    return Data, Method
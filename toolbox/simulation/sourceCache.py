@@ -0,0 +1,123 @@
+'''
+    Content-addressed on-disk cache for generated Python source,
+    e.g. the nullspace functions of createNullSpaceFunction and
+    the Jacobian section of writeJacobianFunction. Each entry
+    is stored in SciPyModel.MetaData.CacheDirectory as a pair
+    of files named by the SHA-1 hash of the model structure:
+
+        <key>.py   -- the generated source
+        <key>.json -- metadata, e.g. the nullspace dimension
+
+    Cached source is compiled like freshly generated source, so
+    a hit skips all symbolic work. Entries share the directory
+    and the least-recently-used eviction of modelCache.
+'''
+
+# Bump whenever the generated source changes so stale entries are
+# never reused.
+CACHE_VERSION = '1'
+
+
+def hashModelSource( SciPyModel, Kind, Settings=() ):
+    '''
+        Return the cache key of the source of type Kind, e.g.
+        'NullSpace', computed from the vectorized formulas, the
+        stoichiometry, Parameters.KineticFlag, the model
+        dimensions and any further Settings which change the
+        generated source.
+    '''
+    import hashlib, numpy, scipy.sparse
+
+    Hash = hashlib.sha1(('SciPyModel-source-' + CACHE_VERSION + '\n' +
+                         Kind + '\n').encode())
+    for Formula in SciPyModel.Reactions.Formulas:
+        Hash.update((Formula + '\n').encode())
+
+    # Hash the stoichiometry in canonical compressed form
+    Stoichiometry = scipy.sparse.csc_matrix(SciPyModel.Reactions.Stoichiometry,
+                                            dtype=float)
+    Stoichiometry.sum_duplicates()
+    Stoichiometry.sort_indices()
+    for Array in [Stoichiometry.data, Stoichiometry.indices,
+                  Stoichiometry.indptr]:
+        Hash.update(numpy.ascontiguousarray(Array).tobytes())
+
+    Hash.update(repr((
+        Stoichiometry.shape, scipy.sparse.issparse(
+            SciPyModel.Reactions.Stoichiometry),
+        SciPyModel.Species.Quantity, SciPyModel.Parameters.Quantity,
+        [bool(Flag) for Flag in SciPyModel.Parameters.KineticFlag],
+        tuple(Settings))).encode())
+
+    return Hash.hexdigest()
+
+
+def readSourceCache( SciPyModel, Key ):
+    '''
+        Return (Source, MetaData) of the cache entry named Key
+        within SciPyModel.MetaData.CacheDirectory, or
+        (None, None) if there is no valid entry.
+    '''
+    import os, json
+
+    BasePath = os.path.join(SciPyModel.MetaData.CacheDirectory, Key)
+
+    # Check that both halves of the entry exist and are readable
+    try:
+        with open(BasePath + '.json', 'r') as FileObject:
+            MetaData = json.load(FileObject)
+        with open(BasePath + '.py', 'rb') as FileObject:
+            Source = bytearray(FileObject.read())
+    except (IOError, OSError, ValueError):
+        return None, None
+
+    if MetaData.get('Version') != CACHE_VERSION:
+        return None, None
+
+    # Refresh access time for least-recently-used eviction
+    try:
+        os.utime(BasePath + '.py', None)
+    except OSError:
+        pass
+
+    return Source, MetaData
+
+
+def writeSourceCache( SciPyModel, Key, Source, MetaData=None ):
+    '''
+        Store Source and the JSON serializable MetaData under
+        the cache entry named Key, using temporary files renamed
+        into place like writeModelCache, and evict old entries
+        if MetaData.CacheSizeLimit is exceeded.
+    '''
+    import os, json, tempfile
+    from toolbox.sbml.modelCache import pruneCacheDirectory
+
+    Directory = SciPyModel.MetaData.CacheDirectory
+    if not os.path.isdir(Directory):
+        try:
+            os.makedirs(Directory)
+        except OSError:
+            if not os.path.isdir(Directory):
+                raise
+
+    BasePath = os.path.join(Directory, Key)
+    MetaData = dict(MetaData or {})
+    MetaData['Version'] = CACHE_VERSION
+
+    # Write the source
+    Handle, TempPath = tempfile.mkstemp(dir=Directory, suffix='.py.tmp')
+    with os.fdopen(Handle, 'wb') as FileObject:
+        FileObject.write(bytes(Source))
+    os.rename(TempPath, BasePath + '.py')
+
+    # Write metadata last, its presence marks the entry as complete
+    Handle, TempPath = tempfile.mkstemp(dir=Directory, suffix='.json.tmp')
+    with os.fdopen(Handle, 'w') as FileObject:
+        json.dump(MetaData, FileObject)
+    os.rename(TempPath, BasePath + '.json')
+
+    if SciPyModel.MetaData.CacheSizeLimit != None:
+        pruneCacheDirectory(Directory, SciPyModel.MetaData.CacheSizeLimit)
+
+    return BasePath
@@ -0,0 +1,160 @@
+def writeJacobianFunction( SciPyModel ):
+    '''
+        Append analytic Jacobian functions to the derivative
+        function generated by writeODEFunction. The Jacobian is
+        built symbolically as S * dv/dy, where dv/dy holds the
+        derivatives of each reaction rate with respect to the
+        species it depends on. The parameter Jacobian S * dv/dp
+        is built the same way.
+
+        To Do
+        -----
+        1. Investigate common subexpression elimination for
+           very large rate laws.
+
+        Parameters
+        ----------
+        SciPyModel : internal object instance
+            Requires that writeODEFunction was called.
+
+        Returns
+        -------
+        SciPyModel : internal object instance
+            SciPyModel object with jac_fun and pjac_fun appended to
+            SciPyModel.ToolboxFunctions.DerivativeFunction.
+
+        See Also
+        --------
+        writeODEFunction, integrateODEFunction
+
+        Notes
+        -----
+        The generated functions are called as
+
+        jac_fun( y, t, p )
+        pjac_fun( y, t, p )
+
+        and return the (species x species) matrix with entry
+        [i, j] equal to d(dy_i/dt)/dy_j and the (species x
+        parameters) matrix with entry [i, k] equal to
+        d(dy_i/dt)/dp_k. The results are dense arrays when the
+        stoichiometry matrix is dense and scipy.sparse matrices
+        when it is sparse.
+
+        Calling writeODEFunction again discards the Jacobian,
+        so this function must be called after every rewrite.
+
+        If MetaData.CacheDirectory is set the generated section
+        is stored there, keyed by the formulas and stoichiometry,
+        and later calls for the same model structure append it
+        without any symbolic differentiation, see sourceCache.
+    '''
+    # Import required packages
+    import re, numpy, sympy, scipy.sparse
+    from sympy.printing.lambdarepr import NumPyPrinter
+    import toolbox
+    from toolbox.simulation.sourceCache import (hashModelSource,
+                                                readSourceCache,
+                                                writeSourceCache)
+
+    # Remove a previously generated Jacobian section
+    Marker = '\n\n# Jacobian functions \n'
+    MarkerIndex = SciPyModel.ToolboxFunctions.DerivativeFunction.find(
+        Marker.encode())
+    if MarkerIndex >= 0:
+        del SciPyModel.ToolboxFunctions.DerivativeFunction[MarkerIndex:]
+
+    # Reuse the section generated for a model of the same structure
+    if SciPyModel.MetaData.CacheDirectory != None:
+        Key = hashModelSource(SciPyModel, 'Jacobian')
+        Source, MetaData = readSourceCache(SciPyModel, Key)
+        if Source != None:
+            SciPyModel.ToolboxFunctions.DerivativeFunction.extend(Source)
+            return SciPyModel
+
+    # Evaluate the reaction rates symbolically
+    SciPyModel = toolbox.simulation.compileODEFunction(SciPyModel)
+    y = sympy.symarray('y', SciPyModel.Species.Quantity, real=True)
+    p = sympy.symarray('p', SciPyModel.Parameters.Quantity, real=True)
+    R = SciPyModel.ToolboxFunctions.DerivativeModule.rxn_fun(y, 0, p)
+
+    # Print sympy expressions using the vectorized y[i] and p[i] names
+    Printer = NumPyPrinter()
+    def PrintCode(Expression):
+        return re.sub(r'\b([yp])_(\d+)\b', r'\1[\2]', Printer.doprint(Expression))
+
+    # Differentiate each rate only with respect to the species and
+    # parameters it uses
+    SpeciesIndex = dict((y[i], i) for i in range(SciPyModel.Species.Quantity))
+    ParameterIndex = dict(
+        (p[i], i) for i in range(SciPyModel.Parameters.Quantity))
+    JacobianEntries = []
+    ParameterEntries = []
+    for rxn_ix in range(SciPyModel.Reactions.Quantity):
+        Rate = sympy.sympify(R[rxn_ix])
+        for s_ix in sorted(SpeciesIndex[Symbol] for Symbol in Rate.free_symbols
+                           if Symbol in SpeciesIndex):
+            JacobianEntries.append(
+                (rxn_ix, s_ix, PrintCode(sympy.diff(Rate, y[s_ix]))))
+        for p_ix in sorted(ParameterIndex[Symbol]
+                           for Symbol in Rate.free_symbols
+                           if Symbol in ParameterIndex):
+            ParameterEntries.append(
+                (rxn_ix, p_ix, PrintCode(sympy.diff(Rate, p[p_ix]))))
+
+    # Write jac_fun (species x species) and pjac_fun (species x
+    # parameters), each as S times the matching rate derivatives.
+    generated_code = Marker
+    SparseFlag = scipy.sparse.issparse(SciPyModel.Reactions.Stoichiometry)
+    for Name, Entries, Columns in [
+            ('jac', JacobianEntries, SciPyModel.Species.Quantity),
+            ('pjac', ParameterEntries, SciPyModel.Parameters.Quantity)]:
+
+        # Write header information for the function
+        if SparseFlag:
+            generated_code += (Name + '_rows = numpy.array(' + repr(
+                [Entry[0] for Entry in Entries]) + ', dtype=int) \n')
+            generated_code += (Name + '_cols = numpy.array(' + repr(
+                [Entry[1] for Entry in Entries]) + ', dtype=int) \n')
+        generated_code += '\n'
+        generated_code += 'def ' + Name + '_fun( y, t, p ): \n'
+        generated_code += '\n'
+
+        # Write the rate derivatives, either into a dense (reactions x
+        # columns) matrix or into the value array of a sparse one.
+        if SparseFlag:
+            generated_code += (
+                '    drxn = numpy.zeros([' + str(len(Entries)) + '], '
+                'dtype=numpy.result_type(numpy.asarray(y), 1.)) \n')
+        else:
+            generated_code += (
+                '    drxn = numpy.zeros([' + str(SciPyModel.Reactions.Quantity) +
+                ', ' + str(Columns) + '], '
+                'dtype=numpy.result_type(numpy.asarray(y), 1.)) \n')
+        for Entry_ix, (rxn_ix, Column_ix, Code) in enumerate(Entries):
+            if SparseFlag:
+                generated_code += (
+                    '    drxn[' + str(Entry_ix) + '] = ' + Code + '\n')
+            else:
+                generated_code += (
+                    '    drxn[' + str(rxn_ix) + ', ' + str(Column_ix) + '] = ' +
+                    Code + '\n')
+
+        # Write out footer information for the function
+        generated_code += '\n'
+        if SparseFlag:
+            generated_code += (
+                '    drxn = scipy.sparse.csc_matrix((drxn, (' + Name + '_rows, ' +
+                Name + '_cols)), shape=(' + str(SciPyModel.Reactions.Quantity) +
+                ', ' + str(Columns) + ')) \n')
+        generated_code += '    return S.dot(drxn) \n'
+        generated_code += '\n'
+
+    generated_code = generated_code.encode()
+    if SciPyModel.MetaData.CacheDirectory != None:
+        writeSourceCache(SciPyModel, Key, generated_code)
+
+    # Append the Jacobian section to the derivative function
+    SciPyModel.ToolboxFunctions.DerivativeFunction.extend(generated_code)
+
+    return SciPyModel
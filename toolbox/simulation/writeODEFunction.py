@@ -3,8 +3,8 @@ def writeODEFunction( SciPyModel ):
         Create a derivative function from the provided 
         SciPyModel as a basis for other internal packaged
         methods. The derivative function is stored as a 
-        bytearray and written to a file when needed to be
-        called by each internal method.
+        bytearray and compiled in memory by compileODEFunction
+        when needed to be called by each internal method.
 
         To Do
         -----
@@ -29,21 +29,56 @@ def writeODEFunction( SciPyModel ):
         
         Notes
         -----
-        
+        The stoichiometry matrix is written once at module
+        level. A scipy.sparse stoichiometry matrix is written in
+        its compressed form so S.dot(rxn) only touches nonzeros.
+
+        Besides ode_fun( y, t, p ) and rxn_fun( y, t, p ) the
+        source defines the batched variants
+
+        ode_fun_batch( Y, t, P )
+        rxn_fun_batch( Y, t, P )
+
+        which take one member per row of Y (N x species) and P
+        (N x parameters) and evaluate all members with NumPy
+        broadcasting, returning (N x species) derivatives and
+        (N x reactions) rates.
+
+        The rates take the floating point type of y, so the
+        functions can be evaluated with complex states for
+        complex-step differentiation.
     '''
-    # Enable printing of full sized numpy arrays/matrix
-    import numpy
-    numpy.set_printoptions(threshold=numpy.nan)
+    import re, numpy, scipy.sparse
     
     # Write header information for the derivative function file.
-    generated_code = bytearray('')
-    generated_code.extend('from __future__ import division \n')
-    generated_code.extend('import numpy, sympy \n')
-    generated_code.extend('\n')
-    generated_code.extend('def ode_fun( y, t, p ): \n')
-    generated_code.extend('\n')
-    generated_code.extend(
-        '    rxn = numpy.zeros([' + str(SciPyModel.Reactions.Quantity) + ']) \n')
+    generated_code = ''
+    generated_code += 'from __future__ import division \n'
+    generated_code += 'import numpy, sympy, scipy.sparse \n'
+    generated_code += '\n'
+    
+    # Write the stoichiometry matrix once at module level. Sparse
+    # matrices are written as their compressed arrays so the generated
+    # source and S.dot(rxn) both scale with the number of nonzeros.
+    Stoichiometry = SciPyModel.Reactions.Stoichiometry
+    if scipy.sparse.issparse(Stoichiometry):
+        if Stoichiometry.format not in ['csr', 'csc']:
+            Stoichiometry = Stoichiometry.tocsr()
+        generated_code += (
+            'S = scipy.sparse.' + Stoichiometry.format + '_matrix((' +
+            'numpy.array(' + repr(Stoichiometry.data.tolist()) + '), ' +
+            'numpy.array(' + repr(Stoichiometry.indices.tolist()) + '), ' +
+            'numpy.array(' + repr(Stoichiometry.indptr.tolist()) + ')), ' +
+            'shape=' + repr(Stoichiometry.shape) + ') \n')
+    else:
+        generated_code += (
+            'S = numpy.array(' +
+            repr(numpy.asarray(Stoichiometry, dtype=float).tolist()) + ') \n')
+    generated_code += '\n'
+    generated_code += 'def ode_fun( y, t, p ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    rxn = numpy.zeros([' + str(SciPyModel.Reactions.Quantity) +
+        '], dtype=numpy.result_type(numpy.asarray(y), 1.)) \n')
     
     # Loop over each reaction within the SciPyModel object.
     for rxn_ix in range(SciPyModel.Reactions.Quantity):
@@ -51,36 +86,59 @@ def writeODEFunction( SciPyModel ):
         # Get information about the current reaction
         Formula = SciPyModel.Reactions.Formulas[rxn_ix]
         
-        # Append each formula declaration to the growing output bytearray.
-        generated_code.extend(
+        # Append each formula declaration to the growing output source.
+        generated_code += (
             '    # ' + SciPyModel.Reactions.Names[rxn_ix] + '\n')
-        generated_code.extend('    rxn[' + str(rxn_ix) + '] = ' + Formula + '\n')
+        generated_code += '    rxn[' + str(rxn_ix) + '] = ' + Formula + '\n'
     
     # Write out footer information for the derivative function file
-    generated_code.extend('\n')
-    generated_code.extend('    S = numpy.' + repr(SciPyModel.Reactions.Stoichiometry) 
-                          + '\n')
-    generated_code.extend('    \n')
-    generated_code.extend('    dy = S.dot(rxn) \n')
-    generated_code.extend('    return dy \n')
+    generated_code += '\n'
+    generated_code += '    dy = S.dot(rxn) \n'
+    generated_code += '    return dy \n'
     
     # Write function definition for reactions -- edit this to isolate shape/kinetic parameters
-    generated_code.extend('\n')
-    generated_code.extend('\n')
-    generated_code.extend('def rxn_fun( y, t, p ): \n')
-    generated_code.extend('\n')
-    generated_code.extend(
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def rxn_fun( y, t, p ): \n'
+    generated_code += '\n'
+    generated_code += (
         '    rxn = sympy.zeros(' + str(SciPyModel.Reactions.Quantity) + ',1) \n')
     for rxn_ix in range(SciPyModel.Reactions.Quantity):
         Formula = SciPyModel.Reactions.Formulas[rxn_ix]
-        generated_code.extend(
+        generated_code += (
+            '    # ' + SciPyModel.Reactions.Names[rxn_ix] + '\n')
+        generated_code += '    rxn[' + str(rxn_ix) + '] = ' + Formula + '\n'
+    generated_code += '    return rxn \n'
+    
+    # Write batched functions evaluating N parameter sets at once. The
+    # rows of Y (N x species) and P (N x parameters) are the members.
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def rxn_fun_batch( Y, t, P ): \n'
+    generated_code += '\n'
+    generated_code += (
+        '    rxn = numpy.zeros([Y.shape[0], ' +
+        str(SciPyModel.Reactions.Quantity) +
+        '], dtype=numpy.result_type(Y, 1.)) \n')
+    for rxn_ix in range(SciPyModel.Reactions.Quantity):
+        Formula = re.sub(r'\b([yp])\[(\d+)\]',
+                         lambda Match: Match.group(1).upper() + '[:, ' +
+                         Match.group(2) + ']',
+                         SciPyModel.Reactions.Formulas[rxn_ix])
+        generated_code += (
             '    # ' + SciPyModel.Reactions.Names[rxn_ix] + '\n')
-        generated_code.extend('    rxn[' + str(rxn_ix) + '] = ' + Formula + '\n')
-    generated_code.extend('    return rxn \n')
+        generated_code += '    rxn[:, ' + str(rxn_ix) + '] = ' + Formula + '\n'
+    generated_code += '    return rxn \n'
+    generated_code += '\n'
+    generated_code += '\n'
+    generated_code += 'def ode_fun_batch( Y, t, P ): \n'
+    generated_code += '\n'
+    generated_code += '    return S.dot(rxn_fun_batch(Y, t, P).T).T \n'
     
     
-    # Place generated bytearray code into the derivative function
-    SciPyModel.ToolboxFunctions.DerivativeFunction = generated_code
+    # Place generated code into the derivative function as a bytearray
+    SciPyModel.ToolboxFunctions.DerivativeFunction = bytearray(
+        generated_code.encode())
     
     
     return SciPyModel
\ No newline at end of file
@@ -1,3 +1,3 @@
-from sampleSpace import sampleSpace
-from simplePlot import simplePlot
-from localSensitivities import localSensitivities
\ No newline at end of file
+from .sampleSpace import sampleSpace
+from .simplePlot import simplePlot
+from .localSensitivities import localSensitivities
\ No newline at end of file